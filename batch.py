@@ -0,0 +1,283 @@
+import random
+
+import numpy as np
+
+from config import settings
+from effects import Shooter
+from game_elements import Gameboard
+from small_math import wdtcol_percentages_for_level
+from trajectory import trace_cells
+
+# States of a board in a batch
+PLAYING, LAST_ROW_HIT, BOARD_FULL, LEVEL_COMPLETE = range(4)
+STATES = ('playing', 'last-row-hit', 'board-full', 'level-complete')
+
+
+class SweepTable:
+    """
+    Every shot direction traced once over an empty board, so shots can be placed on many boards at once.
+    The bubble stopping a shot is the first occupied cell of its direction's list.
+    Attributes:
+        - step: Angle resolution in degrees.
+        - cells: (angles, n) flat indices of the cells touched by each direction, in order, padded with -1.
+        - landings: (angles, n, 6) flat indices of the free-cell candidates next to each touched cell,
+          closest to the flying bubble first, padded with -1.
+        - top: (angles, columns) top row cells ordered by distance to where the direction reaches the top.
+    """
+    def __init__(self, board, step=0.25):
+        """
+        Traces every direction of the shooter.
+
+        Args:
+            board (Gameboard): A board with the layout of the boards of the batch.
+            step (float): Angle resolution in degrees.
+        """
+        self.step = step
+        self.angles = np.arange(0, 180 + step / 2, step)
+        shooter = Shooter()
+        traces = []
+        for angle in self.angles:
+            shooter.angle = angle
+            traces.append(trace_cells(board, shooter.position[0], shooter.position[1], *shooter.shoot()))
+
+        length = max(1, max(len(entries) for entries, _ in traces))
+        self.cells = np.full((len(self.angles), length), -1, dtype=np.int32)
+        self.landings = np.full((len(self.angles), length, 6), -1, dtype=np.int32)
+        self.top = np.full((len(self.angles), board.cols), -1, dtype=np.int32)
+
+        for a, (entries, top_x) in enumerate(traces):
+            for n, (i, j, x, y) in enumerate(entries):
+                self.cells[a, n] = board.index(i, j)
+                neighbors = sorted(board.get_neighbors(i, j), key=lambda cell: (
+                    (board.xcoords[board.index(*cell)] - x) ** 2 + (board.ycoords[board.index(*cell)] - y) ** 2))
+                self.landings[a, n, :len(neighbors)] = [board.index(ni, nj) for ni, nj in neighbors]
+            if top_x is not None:
+                self.top[a] = sorted(range(board.cols), key=lambda j: abs(board.xcoords[j] - top_x))
+
+    def lookup(self, angles):
+        """
+        Returns the table rows of the given shooter angles, in degrees.
+        """
+        return np.clip(np.rint(np.asarray(angles) / self.step), 0, len(self.angles) - 1).astype(np.intp)
+
+
+class BatchOutcome:
+    """
+    The result of a shot played on every board of a batch, one entry per board.
+    Attributes:
+        - cells: Flat index of the cell where each bubble landed, -1 if it did not land.
+        - popped: Number of bubbles popped.
+        - dropped: Number of bubbles dropped because they were no longer attached.
+        - score_delta: Points gained with the shot.
+        - pushed: True where a new row of bubbles was pushed after the shot.
+        - states: State of each board after the shot (see STATES).
+    """
+    def __init__(self, count):
+        self.cells = np.full(count, -1, dtype=np.int32)
+        self.popped = np.zeros(count, dtype=np.int32)
+        self.dropped = np.zeros(count, dtype=np.int32)
+        self.score_delta = np.zeros(count, dtype=np.int32)
+        self.pushed = np.zeros(count, dtype=bool)
+        self.states = np.zeros(count, dtype=np.uint8)
+
+
+class BatchBoards:
+    """
+    Many boards of the same layout stacked in one array and played together, one vectorized step per shot.
+    Attributes:
+        - grid: (boards, rows, columns) style indices of every cell, 0 meaning clear.
+        - colors: Number of bubble styles of each board; styles go from 1 to colors.
+        - shots: Number of shots played on each board.
+        - scores: Score of each board.
+        - states: State of each board (see STATES); only boards still playing take shots.
+        - sweep: The SweepTable used to place the shots.
+    """
+    def __init__(self, grid, colors, layout, seed=None, sweep=None):
+        """
+        Args:
+            grid (numpy.ndarray): (boards, rows, columns) style indices of every cell.
+            colors (int or numpy.ndarray): Number of bubble styles, for all boards or for each one.
+            layout (Gameboard): A board with the layout of the boards of the batch.
+            seed (int): Seed of the batch's random generator.
+            sweep (SweepTable): Sweep table to share with other batches of the same layout.
+        """
+        self.grid = np.array(grid, dtype=np.uint8)
+        count, rows, cols = self.grid.shape
+        self.colors = np.broadcast_to(np.asarray(colors, dtype=np.int32), (count,)).copy()
+        self.rng = np.random.default_rng(seed)
+        self.sweep = sweep if sweep is not None else SweepTable(layout)
+        self.shots = np.zeros(count, dtype=np.int32)
+        self.scores = np.full(count, 20, dtype=np.int64)
+        self.states = np.zeros(count, dtype=np.uint8)
+
+    @classmethod
+    def from_boards(cls, boards, seed=None):
+        """
+        Stacks existing Gameboards into a batch.
+
+        Args:
+            boards (list): Gameboards sharing the same dimensions.
+            seed (int): Seed of the batch's random generator.
+        """
+        grid = [np.frombuffer(board.grid, dtype=np.uint8).reshape(board.rows, board.cols) for board in boards]
+        return cls(grid, [len(board.styles) - 1 for board in boards], boards[0], seed)
+
+    @classmethod
+    def generate(cls, count, level=1, seed=None, colors=6, percentages=None, sweep=None):
+        """
+        Creates random boards the way Gameboard.random_init does, all at once.
+
+        Args:
+            count (int): Number of boards.
+            level (int): Level of the boards.
+            seed (int): Seed of the batch's random generator.
+            colors (int): Number of bubble styles of every board.
+            percentages (tuple): Width and column percentages given to the random init, those of the level if not
+                given.
+            sweep (SweepTable): Sweep table to share with other batches of the same layout.
+        """
+        layout = Gameboard(level, random.Random(seed))
+        rows, cols = layout.rows, layout.cols
+        batch = cls(np.zeros((count, rows, cols), dtype=np.uint8), colors, layout, seed, sweep)
+
+        wdtpercentage, colpercentage = percentages or wdtcol_percentages_for_level(level)
+        no_lines = min(rows, int(rows * colpercentage) + (0 if level == 1 else 1))
+        batch.grid[:, :no_lines] = batch.random_styles((count, no_lines, cols))
+        boards = np.arange(count)[:, None]
+        for i in range(no_lines):
+            no_randoms = max(int(cols / 2), int(wdtpercentage * (no_lines - 2 * i)))
+            batch.grid[boards, i, batch.rng.integers(0, cols, (count, no_randoms))] = 0
+        return batch
+
+    def random_styles(self, shape, boards=None):
+        """
+        Draws random bubble styles, shape[0] being the number of boards.
+        """
+        colors = self.colors if boards is None else self.colors[boards]
+        upper = colors.reshape((-1,) + (1,) * (len(shape) - 1)) + 1
+        return self.rng.integers(1, upper, shape).astype(np.uint8)
+
+    def hex_dilate(self, mask):
+        """
+        Grows boolean masks of cells by one step in every direction of the hexagonal grid.
+        """
+        out = mask.copy()
+        out[:, :, 1:] |= mask[:, :, :-1]
+        out[:, :, :-1] |= mask[:, :, 1:]
+
+        # Cells of the rows above and below
+        vertical = np.zeros_like(mask)
+        vertical[:, 1:] = mask[:, :-1]
+        vertical[:, :-1] |= mask[:, 1:]
+        out |= vertical
+
+        # Even rows also touch the next column of their adjacent rows, odd rows the previous one
+        out[:, 0::2, :-1] |= vertical[:, 0::2, 1:]
+        out[:, 1::2, 1:] |= vertical[:, 1::2, :-1]
+        return out
+
+    def flood(self, seed, within):
+        """
+        Grows every seed mask inside its allowed cells until it stops changing.
+
+        Args:
+            seed (numpy.ndarray): (boards, rows, columns) starting cells.
+            within (numpy.ndarray): (boards, rows, columns) cells the fill may enter.
+
+        Returns:
+            numpy.ndarray: The filled masks.
+        """
+        reach = seed & within
+        active = np.arange(len(reach))
+        while active.size:
+            grown = self.hex_dilate(reach[active]) & within[active]
+            changed = (grown != reach[active]).any(axis=(1, 2))
+            reach[active] = grown
+            active = active[changed]
+        return reach
+
+    def shoot(self, angles, bubbles=None):
+        """
+        Plays one shot on every board still playing.
+
+        Args:
+            angles (float or numpy.ndarray): Shooter angle in degrees, for all boards or for each one.
+            bubbles (numpy.ndarray): Style of the shot bubble of each board, random if not given.
+
+        Returns:
+            BatchOutcome: What the shot did on each board.
+        """
+        count, rows, cols = self.grid.shape
+        outcome = BatchOutcome(count)
+        boards = np.flatnonzero(self.states == PLAYING)
+        outcome.states[:] = self.states
+        if not boards.size:
+            return outcome
+
+        angles = np.broadcast_to(np.asarray(angles, dtype=np.float64), (count,))[boards]
+        if bubbles is None:
+            bubbles = self.random_styles((boards.size,), boards)
+        else:
+            bubbles = np.broadcast_to(np.asarray(bubbles, dtype=np.uint8), (count,))[boards]
+        grid = self.grid[boards]
+        flat = grid.reshape(len(boards), -1)
+        picks = np.arange(len(boards))
+
+        # Placement: the first occupied cell along each direction stops the shot
+        directions = self.sweep.lookup(angles)
+        touched = self.sweep.cells[directions]
+        occupied = (touched >= 0) & (np.take_along_axis(flat, np.maximum(touched, 0), 1) > 0)
+        has_hit = occupied.any(axis=1)
+        first = occupied.argmax(axis=1)
+        hit_row = touched[picks, first] // cols
+        last_row_hit = has_hit & (hit_row == rows - 1)
+
+        # Free cell closest to the flying bubble next to the hit, or closest free top cell
+        candidates = np.where(has_hit[:, None], self.sweep.landings[directions, first], -1)
+        candidates = np.concatenate([candidates, np.where(has_hit[:, None], -1, self.sweep.top[directions])], axis=1)
+        free = (candidates >= 0) & (np.take_along_axis(flat, np.maximum(candidates, 0), 1) == 0)
+        cells = np.where(free.any(axis=1) & ~last_row_hit, candidates[picks, free.argmax(axis=1)], -1)
+        landed = cells >= 0
+        flat[picks[landed], cells[landed]] = bubbles[landed]
+
+        # Same-color cluster of the placed bubble
+        seed = np.zeros_like(grid, dtype=bool)
+        seed.reshape(len(boards), -1)[picks[landed], cells[landed]] = True
+        cluster = self.flood(seed, grid == bubbles[:, None, None])
+        popped = cluster.sum(axis=(1, 2))
+        pop = popped >= 3
+        grid[cluster & pop[:, None, None]] = 0
+        popped = np.where(pop, popped, 0)
+
+        # Bubbles no longer attached to the top row, looked for only where a bubble landed like Gameboard does
+        occupied_cells = grid > 0
+        top_seed = np.zeros_like(occupied_cells)
+        top_seed[:, 0] = occupied_cells[:, 0]
+        floating = occupied_cells & ~self.flood(top_seed, occupied_cells) & landed[:, None, None]
+        dropped = floating.sum(axis=(1, 2))
+        grid[floating] = 0
+
+        states = np.where(last_row_hit, LAST_ROW_HIT, PLAYING).astype(np.uint8)
+        states[(states == PLAYING) & ~grid.any(axis=(1, 2))] = LEVEL_COMPLETE
+
+        # Push two new rows on the boards whose turn it is
+        shots = self.shots[boards] + 1
+        push = (states == PLAYING) & (shots % settings().push_interval == 0)
+        full = push & grid[:, rows - 1].any(axis=1)
+        states[full] = BOARD_FULL
+        push &= ~full
+        grid[push, 2:] = grid[push, :-2]
+        grid[push, :2] = self.random_styles((int(push.sum()), 2, cols), boards[push])
+
+        self.grid[boards] = grid
+        self.shots[boards] = shots
+        self.scores[boards] += popped * 15
+        self.states[boards] = states
+
+        outcome.cells[boards] = cells
+        outcome.popped[boards] = popped
+        outcome.dropped[boards] = dropped
+        outcome.score_delta[boards] = popped * 15
+        outcome.pushed[boards] = push
+        outcome.states[boards] = states
+        return outcome
@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from array import array
+
+# Render off-screen, and find the game modules when run as a script
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+import config
+from effects import Score, Shooter
+from game_elements import Gameboard
+from profiler import PHASES, FrameProfiler
+from styles import draw_background, invalidate_background
+
+# Where the results are recorded with --save and compared to otherwise
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Board sizes measured by default, as 'N' for N x N boards or 'ROWSxCOLUMNS'
+SIZES = ('12', '32', '64', '128', '256', '64x200')
+# Frame duration of the full-frame benchmark, in seconds
+FRAME_TIME = 1 / 60
+
+
+def board_size(size):
+    """
+    Parses a board size given as 'N' for an N x N board or as 'ROWSxCOLUMNS'.
+
+    Returns:
+        tuple: (rows, columns) of the board.
+    """
+    rows, _, columns = size.partition('x')
+    return int(rows), int(columns or rows)
+
+
+def configure(size):
+    """
+    Loads settings for a board of the given size, with a window large enough to keep bubbles 8 pixels wide
+    and to leave room for the shooter under the board.
+
+    Args:
+        size (str): The board size, as given to board_size.
+
+    Returns:
+        Settings: The new settings.
+    """
+    rows, columns = board_size(size)
+    defaults = config.Settings()
+    width = max(defaults.window_width, 16 * (columns + 1) + defaults.margin_left + defaults.margin_right)
+    height = max(defaults.window_height, 16 * (rows + 1) + defaults.margin_top + defaults.margin_bottom + 200)
+    return config.reload(rows=rows, columns=columns, window_width=width, window_height=height)
+
+
+def measure(func, setup=None, repeat=5, budget=0.05):
+    """
+    Times a function, leaving the setup run before every call out of the measure.
+
+    Args:
+        func (callable): The function to time.
+        setup (callable): Run before every call, e.g. to restore the board the function changes.
+        repeat (int): Number of measures, the best one is kept.
+        budget (float): Rough duration of a measure in seconds; the number of calls is chosen from it.
+
+    Returns:
+        float: The best time of a call in seconds.
+    """
+    def timed(number):
+        total = 0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            total += time.perf_counter() - start
+        return total
+
+    number = max(1, int(budget / max(timed(1), 1e-7)))
+    return min(timed(number) / number for _ in range(repeat))
+
+
+def board_benchmarks(size):
+    """
+    Measures the gameboard hot paths on a board of the given size.
+
+    Args:
+        size (str): The board size, as given to board_size.
+
+    Returns:
+        dict: The time of a call of every benchmark, keyed by 'name/size'.
+    """
+    settings = configure(size)
+    surface = pygame.Surface((settings.window_width, settings.window_height))
+    board = Gameboard(1, random.Random(0))
+    initial = array('B', board.grid)
+    shooter, score = Shooter(), Score(20)
+    shooter.set_bubble(board.make_bubble(board.bubbles_queue.peek()[0]))
+    angles = [30 + 120 * n / 16 for n in range(17)]
+
+    def restore(grid=initial):
+        board.set_grid(grid)
+        board.settled = False
+        board.dirty.clear()
+
+    def shoot():
+        shooter.angle = angles[0]
+        angles.append(angles.pop(0))
+        board.use_shooter(shooter, score)
+
+    def move_shooter():
+        shooter.angle = angles[0]
+        angles.append(angles.pop(0))
+        shooter.draw(surface)
+
+    # Board filled with a single style, where the cluster of any bubble is the whole board
+    full = array('B', [1]) * len(board.grid)
+    # Board whose last row is free, so a push does not end the game
+    pushable = initial[:]
+    pushable[board.index(board.rows - 1, 0):] = array('B', bytes(board.cols))
+
+    results = {
+        'find_cluster': measure(lambda: board.find_cluster(0, 0, *board.styles[1]), lambda: restore(full)),
+        'remove_floating_bubbles': measure(board.remove_floating_bubbles, restore),
+        'use_shooter': measure(shoot, restore),
+        'update_gameboard': measure(board.update_gameboard, lambda: restore(pushable)),
+        'Gameboard.draw': measure(lambda: board.draw(surface), restore),
+        'Shooter.draw/still': measure(lambda: shooter.draw(surface)),
+        'Shooter.draw/moving': measure(move_shooter),
+        'draw_background': measure(lambda: draw_background(surface)),
+        'draw_background/cold': measure(lambda: draw_background(surface), invalidate_background),
+    }
+    return {f'{name}/{size}': value for name, value in results.items()}
+
+
+def replay(frames=600, seed=5, profiler=None):
+    """
+    Replays a fixed input script through the main loop of the game with the current settings.
+    The mouse sweeps across the window and a shot is fired every 40 frames. Levels go on without their screen,
+    and a lost game is followed by a new one, seeded with the next seed.
+
+    Args:
+        frames (int): Number of frames to play.
+        seed (int): Seed of the game and of the script.
+        profiler (FrameProfiler): Times the phases of every frame.
+
+    Returns:
+        float: The mean time of a frame in seconds.
+    """
+    import draw
+
+    settings = config.settings()
+    window = pygame.display.set_mode((settings.window_width, settings.window_height))
+    script = random.Random(seed)
+    shots = {n: script.randint(0, settings.window_width) for n in range(40, frames, 40)}
+    frame = [0]
+
+    def events():
+        n = frame[0]
+        frame[0] += 1
+        pygame.event.pump()
+        if n in shots:
+            return [pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(shots[n], 200))]
+        return []
+
+    def pointer():
+        return (frame[0] * 7) % settings.window_width, 200
+
+    clock = pygame.time.Clock()
+    played = 0
+    start = time.perf_counter()
+    while played < frames:
+        # The run stops when the game is lost instead of waiting on the game over screen
+        played += draw.run(window, clock, draw.init_game(seed), events, pointer, FRAME_TIME, frames - played,
+                           profiler, game_over=lambda window, clock: False, level_complete=lambda window, clock: None)
+        seed += 1
+    return (time.perf_counter() - start) / played
+
+
+def frame_benchmark(frames=600, seed=5):
+    """
+    Replays the input script at the default settings.
+
+    Returns:
+        dict: The time of a frame, keyed by 'frame'.
+    """
+    config.reload()
+    return {'frame': replay(frames, seed)}
+
+
+def stress(size, frames=600, seed=5):
+    """
+    Replays the input script on a large board and checks the frame budget holds.
+    The first frame, which draws the whole board and traces the landing table, is left out.
+
+    Args:
+        size (str): The board size, as given to board_size.
+        frames (int): Number of frames to play.
+        seed (int): Seed of the game and of the script.
+
+    Returns:
+        bool: True if 95% of the frames took less than a frame at the configured frame rate.
+    """
+    settings = configure(size)
+    profiler = FrameProfiler(window=frames)
+    replay(frames, seed, profiler)
+    first = profiler.frames.popleft()
+    budget = 1 / settings.fps
+    p50, p95, p99 = profiler.percentiles('total')
+    print(f"stress {size}: first frame {sum(first.values()) * 1000:.1f} ms, "
+          f"p50 {p50 * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms, "
+          f"budget {budget * 1000:.1f} ms")
+    for phase in PHASES:
+        print(f"  {phase:<10} p95 {profiler.percentiles(phase)[1] * 1000:.2f} ms")
+    return p95 <= budget
+
+
+def compare(results, baseline, threshold):
+    """
+    Lists the benchmarks slower than their baseline by more than the threshold.
+
+    Args:
+        results (dict): Times of the current run.
+        baseline (dict): Times of the baseline.
+        threshold (float): Allowed slowdown, 0.2 for 20%.
+
+    Returns:
+        list: The names of the regressed benchmarks.
+    """
+    return [name for name, value in results.items()
+            if name in baseline and value > baseline[name] * (1 + threshold)]
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks, prints them and saves them or compares them to the baseline.
+
+    Returns:
+        int: 1 if a benchmark regressed, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the Bubble Buster hot paths.")
+    parser.add_argument('--sizes', nargs='+', default=SIZES, help="board sizes to measure, as N or ROWSxCOLUMNS")
+    parser.add_argument('--frames', type=int, default=600, help="frames of the full-frame benchmark, 0 to skip it")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="record the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown before failing, 0.2 for 20%%")
+    parser.add_argument('--stress', metavar='SIZE',
+                        help="only replay the input script on a board of this size and check the frame budget")
+    args = parser.parse_args(argv)
+
+    if args.stress:
+        pygame.init()
+        within_budget = stress(args.stress, args.frames or 600)
+        pygame.quit()
+        return 0 if within_budget else 1
+
+    pygame.init()
+    results = {}
+    for size in args.sizes:
+        results.update(board_benchmarks(size))
+    if args.frames:
+        results.update(frame_benchmark(args.frames))
+    pygame.quit()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    for name, value in results.items():
+        change = f"{value / baseline[name] - 1:+.0%}" if baseline.get(name) else ""
+        print(f"{name:32} {value * 1e6:12.1f} us {change:>7}")
+    if 'frame' in results:
+        print(f"full frame: {1 / results['frame']:.0f} frames per second")
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        return 0
+    regressed = compare(results, baseline, args.threshold)
+    if regressed:
+        print(f"Slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
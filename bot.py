@@ -0,0 +1,236 @@
+import argparse
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from engine import GameEngine
+from game_elements import Gameboard
+from trajectory import resolve_shot
+
+# Weights of the shot evaluation
+POP_WEIGHT = 10  # Per popped bubble
+DROP_WEIGHT = 15  # Per dropped bubble
+NEIGHBOR_WEIGHT = 2  # Per bubble of the same style next to a bubble that did not pop
+DEPTH_WEIGHT = 20  # Penalty for landing close to the last row, grows with the square of the depth
+STRANDED = -100  # A shot that cannot land anywhere
+LOST = float('-inf')  # A shot hitting the last row
+
+# Work of a turn, in tried angles times board cells, below which the angles are rated in this process:
+# sending the board to the workers and gathering their results costs more than it saves on smaller boards
+POOL_MIN_WORK = 150_000
+
+# Board the shots are simulated on, one per process, and the settings it was made with
+_board = None
+_board_settings = None
+
+
+class _Tally:
+    """
+    Stands in for the Score during simulated shots.
+    """
+    def update(self, deletelist):
+        pass
+
+
+def _init_worker(current=None):
+    """
+    Creates the board of the process the shots are simulated on, with the settings of the bot's process,
+    which a worker started by spawning or before the settings were reloaded would not share.
+
+    Args:
+        current (Settings): The settings of the bot's process, those of this process if not given.
+    """
+    global _board, _board_settings
+    if current is not None and current != config.settings():
+        config.restore(current)
+    _board = Gameboard(1, random.Random(0))
+    _board_settings = config.settings()
+
+
+def board_state(board):
+    """
+    Returns what a worker needs to rebuild a board: its cells, styles and settled flag.
+    """
+    return bytes(board.grid), list(board.styles), board.settled
+
+
+def evaluate_shot(board, style, path):
+    """
+    Plays a resolved shot on a board, rates it and puts the board back as it was.
+
+    Args:
+        board (Gameboard): The board to play on.
+        style (int): Style index of the shot bubble.
+        path (ShotPath): The resolved path of the shot.
+
+    Returns:
+        float: The value of the shot, higher is better.
+    """
+    if path.game_over:
+        return LOST
+    if path.cell is None:
+        return STRANDED
+
+    saved, settled = board.grid.tobytes(), board.settled
+    board.dirty.clear()
+    i, j = path.cell
+    board.set_cell(board.index(i, j), style)
+    popped, dropped = board.update_after_hit(i, j, _Tally())
+    value = POP_WEIGHT * len(popped) + DROP_WEIGHT * len(dropped)
+    if not popped:
+        value += NEIGHBOR_WEIGHT * sum(1 for ni, nj in board.get_neighbors(i, j)
+                                       if board.grid[board.index(ni, nj)] == style)
+    value -= DEPTH_WEIGHT * (i / (board.rows - 1)) ** 2
+
+    # Every cell the shot changed was marked dirty: put them back, keeping the board's counters right
+    for k in list(board.dirty):
+        board.set_cell(k, saved[k])
+    board.settled = settled
+    board.dirty.clear()
+    return value
+
+
+def evaluate_angles(state, style, position, angles, current=None):
+    """
+    Rates shots at several angles on the process' board. Angles landing in the same cell are played once.
+
+    Args:
+        state (tuple): The board to play on, as returned by board_state.
+        style (int): Style index of the shot bubble.
+        position (tuple): (x, y) position of the shooter.
+        angles (list): Shooter angles in degrees.
+        current (Settings): The settings of the bot's process, which give the board's dimensions and geometry;
+            those of this process if not given.
+
+    Returns:
+        list: The (value, angle) of every angle.
+    """
+    if _board is None or _board_settings != (current if current is not None else config.settings()):
+        _init_worker(current)
+    board = _board
+    grid, styles, settled = state
+    board.styles = styles
+    board.style_lookup = {pair: index for index, pair in enumerate(styles)}
+    board.set_grid(grid)
+    board.settled = settled
+
+    results = []
+    values = {}  # Value of every landing already played
+    for angle in angles:
+        # Same direction as Shooter.shoot
+        dx, dy = math.cos(math.radians(angle)), -math.sin(math.radians(angle))
+        path = resolve_shot(board, position[0], position[1], dx, dy)
+        key = (path.cell, path.game_over)
+        if key not in values:
+            values[key] = evaluate_shot(board, style, path)
+        results.append((values[key], angle))
+    return results
+
+
+class Bot:
+    """
+    A player choosing every shot by rating a sweep of shooter angles.
+    On boards large enough, the angles are split into chunks rated on a pool of processes.
+    Attributes:
+        - angles: The shooter angles tried every turn, in degrees.
+        - workers: Number of worker processes, 0 or 1 to rate the shots in this process.
+        - executor: The process pool, None until a turn is large enough to use it.
+    """
+    def __init__(self, workers=None, step=1.0, min_angle=5, max_angle=175):
+        """
+        Args:
+            workers (int): Number of worker processes, one per core if not given, 0 for none.
+            step (float): Angle between two tried shots, in degrees.
+            min_angle (float): Lowest angle tried, in degrees.
+            max_angle (float): Highest angle tried, in degrees.
+        """
+        count = int((max_angle - min_angle) / step) + 1
+        self.angles = [min_angle + n * step for n in range(count)]
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.executor = None
+
+    def choose(self, game):
+        """
+        Chooses the angle of the next shot.
+
+        Args:
+            game (GameEngine): The game to play.
+
+        Returns:
+            float: The shooter angle of the best rated shot, the first one on ties.
+        """
+        bubble = game.shooter.bubble
+        style = game.board.style_index(bubble.fillcolor, bubble.outline)
+        state = board_state(game.board)
+        position = game.shooter.position
+        current = config.settings()
+
+        if self.workers <= 1 or len(self.angles) * len(game.board.grid) < POOL_MIN_WORK:
+            results = evaluate_angles(state, style, position, self.angles, current)
+        else:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                    initargs=(current,))
+            size = -(-len(self.angles) // self.workers)
+            chunks = [self.angles[n:n + size] for n in range(0, len(self.angles), size)]
+            results = []
+            for chunk in self.executor.map(evaluate_angles, [state] * len(chunks), [style] * len(chunks),
+                                           [position] * len(chunks), chunks, [current] * len(chunks)):
+                results += chunk
+        return max(results, key=lambda result: result[0])[1]
+
+    def close(self):
+        """
+        Shuts the process pool down.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def play_game(bot, seed=None, max_shots=1000):
+    """
+    Lets the bot play a full game.
+
+    Args:
+        bot (Bot): The player.
+        seed (int): Seed of the game.
+        max_shots (int): Number of shots after which the game is stopped.
+
+    Returns:
+        tuple: The game, as it ended, and the number of shots played.
+    """
+    game = GameEngine(seed)
+    shots = 0
+    while game.game_over is None and shots < max_shots:
+        game.shoot(bot.choose(game))
+        shots += 1
+    return game, shots
+
+
+def main(argv=None):
+    """
+    Plays games with the bot and prints how each one ended.
+    """
+    parser = argparse.ArgumentParser(description="Let the bot play Bubble Buster games unattended.")
+    parser.add_argument('--games', type=int, default=10, help="number of games to play")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, the next games count up")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, one per core by default")
+    parser.add_argument('--step', type=float, default=1.0, help="angle between two tried shots, in degrees")
+    parser.add_argument('--max-shots', type=int, default=1000, help="shots after which a game is stopped")
+    args = parser.parse_args(argv)
+
+    bot = Bot(workers=args.workers, step=args.step)
+    try:
+        for seed in range(args.seed, args.seed + args.games):
+            game, shots = play_game(bot, seed, args.max_shots)
+            print(f"seed {seed}: level {game.level}, score {game.score.score}, "
+                  f"shots {shots}, {game.game_over or 'stopped'}")
+    finally:
+        bot.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import json
+import os
+import tomllib
+from dataclasses import dataclass, field, fields, replace
+
+# Environment variable naming the configuration file to load
+CONFIG_ENV = 'BUBBLE_BUSTER_CONFIG'
+# Files looked up in the working directory when the environment variable is not set
+CONFIG_FILES = ('bubble_buster.toml', 'bubble_buster.json')
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    The game settings, loaded once and read as attributes.
+    Values derived from the others, such as the bubble radius, are computed when the settings are created.
+    Attributes:
+        - font, font_size: Font used for the score.
+        - window_width, window_height: Size of the game window.
+        - margin_left, margin_right, margin_top, margin_bottom: Margins around the gameboard.
+        - fps: Frame rate limit.
+        - idle_timeout: Longest time in milliseconds the game loop sleeps waiting for input while no bubble is
+          in flight. Frames are only drawn when input arrives, or at this interval while the frame timings are
+          shown, so an idle game uses almost no CPU. 0 draws every frame at the frame rate limit.
+        - shot_speed: Speed of a bubble in flight, in pixels per second.
+        - push_interval: Number of shots between two row pushes.
+        - bubble_number: Number of bubbles per row and per column of the gameboard.
+        - rows, columns: Number of rows and of columns of the gameboard, 0 to use bubble_number.
+        - preview_bubbles: Number of upcoming shooter bubbles shown in the preview.
+        - queue_bias: Chance for a shooter bubble to take a style among those on the board rather than the whole
+          palette, between 0 and 1.
+        - level_pack: Level pack file the boards are loaded from, see levelgen.py; boards are generated
+          on the spot if empty, or for levels the pack does not hold.
+        - board_rows, board_columns: Dimensions of the gameboard in bubbles (derived).
+        - bubble_radius: Radius of a bubble (derived).
+    """
+    font: str = 'Helvetica'
+    font_size: int = 20
+    window_width: int = 400
+    window_height: int = 600
+    margin_left: int = 10
+    margin_right: int = 10
+    margin_bottom: int = 10
+    margin_top: int = 10
+    fps: int = 60
+    idle_timeout: int = 500
+    shot_speed: int = 500
+    push_interval: int = 8
+    bubble_number: int = 12
+    rows: int = 0
+    columns: int = 0
+    preview_bubbles: int = 1
+    queue_bias: float = 0.0
+    level_pack: str = ''
+    board_rows: int = field(init=False)
+    board_columns: int = field(init=False)
+    bubble_radius: float = field(init=False)
+
+    def __post_init__(self):
+        rows = self.rows or self.bubble_number
+        columns = self.columns or self.bubble_number
+        usable_width = self.window_width - (self.margin_left + self.margin_right)
+        usable_height = self.window_height - (self.margin_bottom + self.margin_top)
+        radius = min(usable_width / (columns + 1), usable_height / (rows + 1)) / 2
+        object.__setattr__(self, 'board_rows', rows)
+        object.__setattr__(self, 'board_columns', columns)
+        object.__setattr__(self, 'bubble_radius', radius)
+
+
+def setting_name(prop):
+    """
+    Convert a property name such as 'window-width' or 'FPS' to the matching Settings attribute.
+    """
+    return prop.replace('-', '_').lower()
+
+
+def read_file(path):
+    """
+    Read the settings of a TOML or JSON file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        dict: The settings found in the file, with attribute names as keys.
+    """
+    with open(path, 'rb') as file:
+        values = json.load(file) if path.endswith('.json') else tomllib.load(file)
+
+    known = {f.name for f in fields(Settings) if f.init}
+    values = {setting_name(key): value for key, value in values.items()}
+    unknown = sorted(set(values) - known)
+    if unknown:
+        raise ValueError(f"Unknown settings in {path}: {', '.join(unknown)}")
+    return values
+
+
+def find_config_file():
+    """
+    Returns:
+        str or None: The configuration file to load, if there is one.
+    """
+    if os.environ.get(CONFIG_ENV):
+        return os.environ[CONFIG_ENV]
+    for name in CONFIG_FILES:
+        if os.path.exists(name):
+            return name
+    return None
+
+
+_settings = None
+
+
+def reload(path=None, **overrides):
+    """
+    Load the settings again: the defaults, then the configuration file, then the given overrides.
+
+    Args:
+        path (str): Configuration file to load, the one found by find_config_file if not given.
+        **overrides: Settings to override, by attribute name.
+
+    Returns:
+        Settings: The new settings.
+    """
+    global _settings
+    path = path if path is not None else find_config_file()
+    values = read_file(path) if path is not None else {}
+    values.update({setting_name(key): value for key, value in overrides.items()})
+    _settings = replace(Settings(), **values)
+    return _settings
+
+
+def settings():
+    """
+    Returns:
+        Settings: The current settings, loaded on first use.
+    """
+    return _settings if _settings is not None else reload()
+
+
+def override(**overrides):
+    """
+    Override some of the current settings, keeping the others as they are, unlike reload which reads
+    the configuration file again.
+
+    Args:
+        **overrides: Settings to override, by attribute name.
+
+    Returns:
+        Settings: The new settings.
+    """
+    global _settings
+    _settings = replace(settings(), **{setting_name(key): value for key, value in overrides.items()})
+    return _settings
+
+
+def restore(saved):
+    """
+    Put back settings returned earlier by settings or reload, e.g. after overriding them for a while.
+
+    Args:
+        saved (Settings): The settings to use again.
+
+    Returns:
+        Settings: The restored settings.
+    """
+    global _settings
+    _settings = saved
+    return _settings
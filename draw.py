@@ -1,10 +1,20 @@
+import argparse
+
 import pygame
 
 # Importing custom modules for various game components and utilities
-from scenes import beginning_screen, show_instructions, level_complete_screen, draw_next_bubble, game_over_screen
-from styles import draw_background, getProp
-from game_elements import Gameboard
-from effects import Score, Shooter, initialize_window
+from scenes import (beginning_screen, show_instructions, level_complete_screen, draw_next_bubble, game_over_screen,
+                    draw_landing_preview)
+from config import settings
+from engine import GameEngine
+from effects import ShotFlight, initialize_window
+from render import BoardRenderer
+from profiler import FrameProfiler
+from replay import recorder_in
+import snapshot
+
+# Snapshot written by the quick save key (F5) and read by the quick load key (F9)
+QUICKSAVE = 'quicksave.bbs'
 
 
 def end_game(the_window, the_clock):
@@ -16,93 +26,267 @@ def end_game(the_window, the_clock):
         return False  # Return False to quit the game
 
 
-def init_game():
-    """Initializes the game state for a new game or level."""
-    the_current_level = 1  # Starting with level 1
-    the_gameboard = Gameboard(the_current_level)  # Create the gameboard for the current level
-    the_first_text = Score(20)  # Create the score object to track and display the score
-    the_shooter = Shooter()  # Create the shooter object
-    the_shooter.set_bubble(the_gameboard.bubbles_queue.pop(0))  # Assign the first bubble from the queue to the shooter
-    the_next_bubble = the_gameboard.bubbles_queue[0]  # Peek at the next bubble in the queue
-    return the_current_level, the_gameboard, the_shooter, the_next_bubble, the_first_text
+def init_game(seed=None):
+    """Initializes the game state for a new game, starting with level 1."""
+    return GameEngine(seed, level=1)
 
 
-if __name__ == "__main__":
-    # Initialize the game window and clock with dimensions and title
-    window, clock = initialize_window(getProp('window-width'), getProp('window-height'), "Bubble Buster")
+def quick_load(path):
+    """
+    Loads a saved game, if the snapshot can be read.
 
-    # Initialize game state variables
-    current_level, gameboard, shooter, next_bubble, first_text = init_game()
-    running = True  # Game running state
-    no_iter = 0
-    # Display the introduction screens
-    beginning_screen(window, clock)  # Show the beginning screen
-    show_instructions(window, clock)  # Show the instructions screen
+    Args:
+        path (str): Path of the snapshot.
 
-    # Main game loop
-    while running:
-        no_iter += 1
+    Returns:
+        GameEngine or None: The saved game, None if there is none or it does not fit the settings.
+    """
+    try:
+        return snapshot.load(path)
+    except (OSError, ValueError) as error:
+        print(f"Cannot load {path}: {error}")
+        return None
+
+
+def start_recording(recorder, record, game, frame):
+    """
+    Ends the log of the last game, if it was recorded, and starts the log of a new game.
+    A game resumed from a snapshot is not recorded, as it cannot be replayed from its seed.
+
+    Args:
+        recorder (Recorder): The log of the last game, or None.
+        record (callable): Returns the Recorder of a game, None if games are not recorded.
+        game (GameEngine): The new game.
+        frame (int): Index of the current frame.
+
+    Returns:
+        Recorder or None: The log of the new game.
+    """
+    if recorder is not None:
+        recorder.end(frame)
+    return record(game) if record is not None and not game.resumed else None
+
+
+def draw_hud(surface, game):
+    """
+    Draws the heads-up display of a game: the score, then the bar of the next bubbles.
+
+    Args:
+        surface (pygame.Surface): Where to draw it.
+        game (GameEngine): The game.
+
+    Returns:
+        list: The areas that were drawn.
+    """
+    return [game.score.draw(surface), draw_next_bubble(surface, game.next_bubbles())]
+
+
+def wait_events(timeout):
+    """
+    Sleeps until events arrive or the timeout passes.
+
+    Args:
+        timeout (int): Longest time to sleep, in milliseconds.
 
+    Returns:
+        list: The events waiting once awake, empty if the timeout passed.
+    """
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
 
-        for event in pygame.event.get():  # Process all events in the event queue
+
+def run(window, clock, game, events=pygame.event.get, pointer=pygame.mouse.get_pos, frame_time=None,
+        max_frames=None, profiler=None, shots=None, record=None, autosave=None, game_over=None, level_complete=None):
+    """
+    Runs the main game loop until the player quits.
+
+    Args:
+        window (pygame.Surface): The game window.
+        clock (pygame.time.Clock): The clock limiting the frame rate.
+        game (GameEngine): The game to play.
+        events (callable): Returns the events of a frame, pygame.event.get by default.
+        pointer (callable): Returns the mouse position, pygame.mouse.get_pos by default.
+        frame_time (float): Fixed duration of a frame in seconds, e.g. to replay a script;
+            the measured frame time and the frame rate limit are used if not given.
+        max_frames (int): Number of frames after which the loop stops, no limit if not given.
+        profiler (FrameProfiler): Times the phases of every frame, a new one keeping no trace if not given.
+            F3 shows or hides its overlay.
+        shots (list): Recorded (frame, angle) shots fired instead of the mouse clicks, to replay a game.
+            A shot is fired at its frame, or as soon as the bubble before it has landed. Restarting stops the replay.
+        record (callable): Called with every new game, returns the Recorder writing its log; games are not
+            recorded if not given.
+        autosave (str): Snapshot file the game is saved to after every shot, to recover it after a crash.
+        game_over (callable): Called with the window and the clock when a game is lost or the player quits with 'Q',
+            returns True to start a new game and False to stop; end_game, which asks the player, if not given.
+        level_complete (callable): Called with the window and the clock when a level is complete;
+            level_complete_screen, which waits for the player, if not given.
+
+    While no bubble is in flight, the loop sleeps until the next event instead of drawing frames that would not
+    change, waking up every idle_timeout milliseconds only to refresh the frame timings while they are shown;
+    it runs at the frame rate limit again as soon as a shot is fired. The frames a wait skipped still count,
+    at the frame rate limit, so a recorded game replays with its pauses. This only applies with pygame's own
+    events and the measured frame time, and not while a game is replayed; an idle_timeout of 0 turns it off.
+
+    Returns:
+        int: The number of frames played, including the frames skipped while idle.
+    """
+    running = True  # Game running state
+    game_over = game_over if game_over is not None else end_game
+    level_complete = level_complete if level_complete is not None else level_complete_screen
+    renderer = BoardRenderer(window)  # Renders only the parts of the window that change
+    profiler = profiler if profiler is not None else FrameProfiler()
+
+    # Main game loop
+    flight = None  # The shot currently in flight, if any
+    dt = 0  # Time elapsed during the last frame, in seconds
+    frames = 0
+    recorder = start_recording(None, record, game, frames)
+    pending = iter(shots) if shots is not None else None
+    next_shot = next(pending, None) if pending is not None else None
+    idle_timeout = settings().idle_timeout if events is pygame.event.get and frame_time is None else 0
+    woken = None  # Events that woke the loop up from an idle wait, to process in the next frame
+    idle_time = 0  # Time waited idle not yet counted as a frame, in milliseconds times the frame rate
+    while running and (max_frames is None or frames < max_frames):
+        profiler.start_frame()
+        for event in woken if woken is not None else events():  # Process all events in the event queue
             if event.type == pygame.QUIT:  # Handle window close event
                 running = False
-                no_iter = 0
             elif event.type == pygame.KEYDOWN:  # Handle key press events
 
-                if event.key == pygame.K_r:  # Restart the game on pressing 'R'
+                if event.key == pygame.K_F3:  # Show or hide the frame timings on pressing 'F3'
+                    profiler.toggle()
+                elif event.key == pygame.K_F5:  # Quick save on pressing 'F5', as before the shot in flight
+                    snapshot.save(game, QUICKSAVE)
+                elif event.key == pygame.K_F9:  # Quick load on pressing 'F9'
+                    loaded = quick_load(QUICKSAVE)
+                    if loaded is not None:
+                        game, flight = loaded, None
+                        recorder = start_recording(recorder, record, game, frames)
+                        pending = next_shot = None
+                        renderer.invalidate()
+                elif event.key == pygame.K_r:  # Restart the game on pressing 'R'
                     running = True
-                    no_iter = 0
-                    current_level, gameboard, shooter, next_bubble, first_text = init_game()
+                    flight = None
+                    game = init_game()
+                    recorder = start_recording(recorder, record, game, frames)
+                    pending = next_shot = None
                 elif event.key == pygame.K_q:  # Quit or restart on pressing 'Q'
-                    running = end_game(window, clock)  # Determine if the player wants to quit or restart
-                    if running:  # If restarting, reinitialize the game state
-                        no_iter = 0
-                        current_level, gameboard, shooter, next_bubble, first_text = init_game()
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Handle left mouse button click
-                # Update the shooter's angle based on the mouse position
-                shooter.update_angle(pygame.mouse.get_pos()[0], pygame.mouse.get_pos()[1])
-                # Use the shooter to fire a bubble and check if it went below the gameboard
-                if not gameboard.use_shooter(shooter, window, first_text):
-                    running = end_game(window, clock)  # End the game if the bubble goes below
+                    running = game_over(window, clock)  # Determine if the player wants to quit or restart
+                    renderer.invalidate()
                     if running:  # If restarting, reinitialize the game state
-                        current_level, gameboard, shooter, next_bubble, first_text = init_game()
-
-                # Update the shooter bubble and the next bubble in the queue
-                if gameboard.bubbles_queue:
-                    shooter = Shooter()
-                    shooter.set_bubble(gameboard.bubbles_queue.pop(0))  # Assign the next bubble to the shooter
-                    next_bubble = gameboard.bubbles_queue[0] if gameboard.bubbles_queue else None
-
-                # Check if the current level is complete
-                if gameboard.is_empty():
-                    level_complete_screen(window, clock)  # Show the level complete screen
-                    current_level += 1  # Move to the next level
-                    gameboard = Gameboard(current_level)  # Create a new gameboard for the new level
-                    shooter = Shooter()
-                    shooter.set_bubble(gameboard.bubbles_queue.pop(0))  # Assign the first bubble of the new level
-                    next_bubble = gameboard.bubbles_queue[0]  # Peek at the next bubble in the queue
-
-                if no_iter % 8 == 0 and gameboard.update_gameboard():
-                    running = end_game(window, clock)
+                        flight = None
+                        game = init_game()
+                        recorder = start_recording(recorder, record, game, frames)
+                        pending = next_shot = None
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and flight is None and pending is None:
+                # Update the shooter's angle based on the mouse position and fire the bubble
+                game.shooter.update_angle(event.pos[0], event.pos[1])
+                flight = ShotFlight(game.shooter, game.board)
+                if recorder is not None:
+                    recorder.shot(frames, game.shooter.angle)
+        if next_shot is not None and flight is None and frames >= next_shot[0]:
+            # Fire the next recorded shot at its exact angle
+            game.shooter.angle = next_shot[1]
+            flight = ShotFlight(game.shooter, game.board)
+            next_shot = next(pending, None)
+        profiler.mark('events')
+
+        # Move the bubble in flight and play the shot once it lands
+        if flight is not None:
+            flight.advance(dt)
+            if flight.is_done():
+                outcome = game.land(flight.path)
+                flight = None
+                if autosave is not None and not outcome.game_over:
+                    snapshot.save(game, autosave)
+                if outcome.game_over:
+                    # The bubble hit the last row or the board overflowed
+                    if recorder is not None:
+                        recorder.end(frames)
+                    running = game_over(window, clock)
                     if running:  # If restarting, reinitialize the game state
-                        current_level, gameboard, shooter, next_bubble, first_text = init_game()
+                        game = init_game()
+                        recorder = start_recording(recorder, record, game, frames)
+                        pending = next_shot = None
+                elif outcome.level_complete:
+                    if recorder is not None:
+                        recorder.level()
+                    level_complete(window, clock)  # Show the level complete screen
+                renderer.invalidate()
+        profiler.mark('shot')
 
-        # Continuously update the shooter's angle based on the mouse position
-        shooter.update_angle(pygame.mouse.get_pos()[0], pygame.mouse.get_pos()[1])
+        # Continuously update the shooter's angle based on the mouse position, unless a game is replayed
+        if pending is None:
+            mousex, mousey = pointer()
+            game.shooter.update_angle(mousex, mousey)
 
         # Render the game screen
-        draw_background(window)  # Draw the background
-        gameboard.draw(window)  # Draw the gameboard and bubbles
-        first_text.draw(window)  # Draw the score text
-        shooter.draw(window)  # Draw the shooter
-
-        # Draw the next bubble if available
-        if next_bubble:
-            draw_next_bubble(window, next_bubble)
-
-        # Update the display and set the frame rate
-        pygame.display.flip()
-        clock.tick(getProp('FPS'))
+        renderer.update_board(game.board)  # Repaint the cells of the gameboard that changed
+        profiler.mark('board')
+        # Draw the score and the next bubbles of the queue again if they changed
+        renderer.update_hud((game.score.score, game.score.color, game.next_bubbles()), draw_hud, game)
+        profiler.mark('hud')
+        renderer.restore()  # Erase the moving elements of the last frame
+        profiler.mark('background')
+        overlay_rects = []
+        if flight is None:
+            # Show where the bubble would land, looked up in the board's landing table
+            overlay_rects.append(draw_landing_preview(window, game.board, game.predict_landing(), game.shooter.bubble))
+        overlay_rects.append(game.shooter.draw(window))  # Draw the shooter and its bubble, possibly in flight
+        profiler.mark('shooter')
+
+        # Draw the frame timings if they are shown, timed with the display update
+        overlay_rects.append(profiler.draw(window))
+        # Update the changed areas of the display and measure the frame time
+        renderer.present(overlay_rects)
+        profiler.mark('flip')
+        woken = None
+        if frame_time is None:
+            dt = clock.tick(settings().fps) / 1000
+            if idle_timeout and running and flight is None and pending is None:
+                # Nothing moves: sleep until the player does something, and only wake up to refresh
+                # the frame timings while they are shown
+                woken = wait_events(idle_timeout)
+                while not woken and not profiler.visible:
+                    woken = wait_events(idle_timeout)
+                # The wait does not count in the time of the next frame, but the frames it skipped are counted,
+                # so the frame indices of the recorded shots keep following the time played
+                skipped, idle_time = divmod(idle_time + clock.tick() * settings().fps, 1000)
+                frames += skipped
+        else:
+            dt = frame_time
+        profiler.mark('idle')
+        profiler.end_frame()
+        frames += 1
+    if recorder is not None:
+        recorder.end(frames)
+    return frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Bubble Buster.")
+    parser.add_argument('--trace', metavar='FILE', help="write the frame timings to a CSV or JSON file on exit")
+    parser.add_argument('--record', metavar='DIR', help="write a replay log of every game to this directory")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the first game, a random one by default")
+    parser.add_argument('--autosave', metavar='FILE', help="save the game to this snapshot after every shot")
+    parser.add_argument('--load', metavar='FILE', help="continue the game saved in this snapshot")
+    args = parser.parse_args()
+    profiler = FrameProfiler(keep_trace=args.trace is not None)
+
+    # Initialize the game window and clock with dimensions and title
+    window, clock = initialize_window(settings().window_width, settings().window_height, "Bubble Buster")
+
+    try:
+        # Display the introduction screens
+        beginning_screen(window, clock)  # Show the beginning screen
+        show_instructions(window, clock)  # Show the instructions screen
+        game = quick_load(args.load) if args.load else None
+        run(window, clock, game or init_game(args.seed), profiler=profiler,
+            record=recorder_in(args.record) if args.record else None, autosave=args.autosave)
+    finally:
+        if args.trace:
+            profiler.export(args.trace)
 
     pygame.quit()  # Quit the game when the loop ends
@@ -3,7 +3,12 @@ import pygame
 
 from game_elements import Bubble
 from small_math import get_line_end
-from styles import getProp, randomItemFrom, darker_colors, colors
+from config import settings
+from styles import randomItemFrom, colors, palette_for
+from trajectory import resolve_shot
+
+# Angle step, in degrees, below which the trajectory preview of the shooter is not traced again
+PREVIEW_STEP = 0.25
 
 def initialize_window(width, height, title):
     """
@@ -22,33 +27,57 @@ def initialize_window(width, height, title):
     pygame.display.set_caption(title)
     return window, pygame.time.Clock()
 
-def draw_dotted_line(window, start_pos, end_pos, color, dot_length, gap_length):
+def dotted_line_dashes(start_pos, end_pos, dot_length, gap_length):
     """
-    Draw a dotted line from start_pos to end_pos.
+    Split a line from start_pos to end_pos into the dashes of a dotted line.
 
     Args:
-        window (pygame.Surface): Pygame window to draw on.
         start_pos (tuple): Starting position of the line (x, y).
         end_pos (tuple): Ending position of the line (x, y).
-        color (tuple): Color of the line (R, G, B).
         dot_length (int): Length of each dot.
         gap_length (int): Length of the gap between dots.
+
+    Returns:
+        list: The ((x, y), (x, y)) start and end points of every dash.
     """
     x1, y1 = start_pos
     x2, y2 = end_pos
     total_length = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+    if total_length == 0:
+        return []
     dx = (x2 - x1) / total_length
     dy = (y2 - y1) / total_length
 
+    dashes = []
     current_length = 0
     while current_length < total_length:
         start_x = x1 + dx * current_length
         start_y = y1 + dy * current_length
         end_x = x1 + dx * (current_length + dot_length)
         end_y = y1 + dy * (current_length + dot_length)
-
-        pygame.draw.line(window, color, (start_x, start_y), (end_x, end_y), 2)
+        dashes.append(((start_x, start_y), (end_x, end_y)))
         current_length += dot_length + gap_length
+    return dashes
+
+def draw_dotted_line(window, start_pos, end_pos, color, dot_length, gap_length):
+    """
+    Draw a dotted line from start_pos to end_pos.
+
+    Args:
+        window (pygame.Surface): Pygame window to draw on.
+        start_pos (tuple): Starting position of the line (x, y).
+        end_pos (tuple): Ending position of the line (x, y).
+        color (tuple): Color of the line (R, G, B).
+        dot_length (int): Length of each dot.
+        gap_length (int): Length of the gap between dots.
+
+    Returns:
+        pygame.Rect: The area of the window that was drawn.
+    """
+    rect = pygame.Rect(round(start_pos[0]), round(start_pos[1]), 0, 0)
+    for start, end in dotted_line_dashes(start_pos, end_pos, dot_length, gap_length):
+        rect.union_ip(pygame.draw.line(window, color, start, end, 2))
+    return rect
 
 class Score:
     """
@@ -56,23 +85,24 @@ class Score:
 
     Attributes:
         score (int): Current score of the game.
-        font (pygame.font.Font): Font used for rendering the score.
-        render (pygame.Surface): Rendered score text.
+        color (str): Color of the score text.
+        font (pygame.font.Font): Font used for rendering the score, loaded on the first draw.
+        render (pygame.Surface): Rendered score text, None until the score is drawn.
         rect (pygame.Rect): Position of the score on the window.
     """
     def __init__(self, score):
         """
-        Initialize the Score object.
+        Initialize the Score object. No font is loaded until the score is drawn,
+        so scores can be kept without a display.
 
         Args:
             score (int): Initial score value.
         """
         self.score = score
-        self.font = pygame.font.SysFont(getProp('font'), getProp('font_size'))
-        self.render = self.font.render('Score: ' + str(self.score), True, colors()['black'], colors()['white'])
-        self.rect = self.render.get_rect()
-        self.rect.left = 10
-        self.rect.bottom = getProp('window-height') - 10
+        self.color = colors()['black']
+        self.font = None
+        self.render = None
+        self.rect = None
 
     def update(self, deletelist):
         """
@@ -82,7 +112,8 @@ class Score:
             deletelist (list): List of bubbles removed.
         """
         self.score += len(deletelist) * 15
-        self.render = self.font.render('Score: ' + str(self.score), True, randomItemFrom(darker_colors(colors())), colors()['white'])
+        self.color = randomItemFrom(palette_for(colors()).dark)
+        self.render = None  # Rendered again on the next draw
 
     def draw(self, window):
         """
@@ -90,8 +121,18 @@ class Score:
 
         Args:
             window (pygame.Surface): The game window.
+
+        Returns:
+            pygame.Rect: The area of the window that was drawn.
         """
-        window.blit(self.render, self.rect)
+        if self.render is None:
+            if self.font is None:
+                self.font = pygame.font.SysFont(settings().font, settings().font_size)
+            self.render = self.font.render('Score: ' + str(self.score), True, self.color, colors()['white'])
+            self.rect = self.render.get_rect()
+            self.rect.left = 10
+            self.rect.bottom = settings().window_height - 10
+        return window.blit(self.render, self.rect)
 
 class Shooter:
     """
@@ -102,6 +143,7 @@ class Shooter:
         gap_length (int): Gap between the dots in the trajectory line.
         angle (float): Current angle of the shooter in degrees.
         position (tuple): Position of the shooter (x, y).
+        preview (tuple): (angle step, dashes) of the last traced trajectory preview.
     """
     def __init__(self):
         """
@@ -110,7 +152,8 @@ class Shooter:
         self.dot_length = 60
         self.gap_length = 3
         self.angle = 90
-        self.position = (getProp('window-width') // 2, getProp('window-height') - 100)
+        self.position = (settings().window_width // 2, settings().window_height - 100)
+        self.preview = None
 
     def set_bubble(self, Bub):
         """
@@ -128,12 +171,17 @@ class Shooter:
 
         Args:
             window (pygame.Surface): The game window.
+
+        Returns:
+            pygame.Rect: The area of the window that was drawn.
         """
-        trajectory_points = self.calculate_reflection_path(500)
-        for start, end in zip(trajectory_points, trajectory_points[1:]):
-            draw_dotted_line(window, start, end, colors()['red'], dot_length=10, gap_length=5)
+        rect = pygame.Rect(self.position, (0, 0))
+        color = colors()['red']
+        for start, end in self.trajectory_preview():
+            rect.union_ip(pygame.draw.line(window, color, start, end, 2))
         if self.bubble:
-            self.bubble.draw(window)
+            rect.union_ip(self.bubble.draw(window))
+        return rect
 
     def update_angle(self, mousex, mousey):
         """
@@ -147,6 +195,23 @@ class Shooter:
         dy = self.position[1] - mousey
         self.angle = max(0, min(180, math.degrees(math.atan2(dy, dx))))
 
+    def trajectory_preview(self):
+        """
+        Get the dashes of the dotted trajectory line for the current angle.
+        The line is only traced and split again once the angle moved to another PREVIEW_STEP.
+
+        Returns:
+            list: The ((x, y), (x, y)) start and end points of every dash.
+        """
+        step = round(self.angle / PREVIEW_STEP)
+        if self.preview is None or self.preview[0] != step:
+            trajectory_points = self.calculate_reflection_path(500)
+            dashes = []
+            for start, end in zip(trajectory_points, trajectory_points[1:]):
+                dashes += dotted_line_dashes(start, end, dot_length=10, gap_length=5)
+            self.preview = (step, dashes)
+        return self.preview[1]
+
     def shoot(self):
         """
         Calculate the direction vector for shooting.
@@ -168,7 +233,7 @@ class Shooter:
         Returns:
             list: A list of (x, y) points representing the trajectory path.
         """
-        WINDOW_WIDTH = getProp('window-width')
+        WINDOW_WIDTH = settings().window_width
         points = [self.position]
         dx, dy = self.shoot()
         x, y = self.position
@@ -199,4 +264,47 @@ class Shooter:
             if y <= 0:
                 break
 
-        return points
\ No newline at end of file
+        return points
+
+class ShotFlight:
+    """
+    Represents a shot in flight, advanced by the main loop every frame.
+
+    Attributes:
+        bubble (Bubble): The flying bubble.
+        path (ShotPath): The resolved path of the shot.
+        speed (float): Flight speed in pixels per second.
+        distance (float): Distance travelled so far.
+    """
+    def __init__(self, shooter, gameboard):
+        """
+        Resolve the shot fired by the shooter against the gameboard.
+
+        Args:
+            shooter (Shooter): The shooter firing the bubble.
+            gameboard (Gameboard): The gameboard the bubble is fired at.
+        """
+        dx, dy = shooter.shoot()
+        self.bubble = shooter.bubble
+        self.path = resolve_shot(gameboard, shooter.position[0], shooter.position[1], dx, dy)
+        self.speed = settings().shot_speed
+        self.distance = 0
+        self.total_length = self.path.length()
+
+    def advance(self, dt):
+        """
+        Move the bubble along its path.
+
+        Args:
+            dt (float): Time elapsed since the last frame, in seconds.
+        """
+        self.distance = min(self.total_length, self.distance + self.speed * dt)
+        x, y = self.path.position_at(self.distance)
+        self.bubble.set_coord(int(x), int(y))
+
+    def is_done(self):
+        """
+        Returns:
+            bool: True once the bubble reached the end of its path.
+        """
+        return self.distance >= self.total_length
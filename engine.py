@@ -0,0 +1,214 @@
+import random
+
+from config import settings
+from effects import Score, Shooter
+from game_elements import Gameboard
+from trajectory import LandingTable, resolve_shot
+
+
+class ShotOutcome:
+    """
+    The result of a single shot.
+    Attributes:
+        - cell: (row, column) where the bubble landed, or None if it did not land.
+        - popped: List of (row, column) cells popped by the shot.
+        - dropped: List of (row, column) cells that fell because they were no longer attached.
+        - score_delta: Points gained with the shot.
+        - game_over: None while the game goes on, otherwise the cause of the game over
+          ('last-row-hit' or 'board-full').
+        - level_complete: True if the shot cleared the board.
+        - pushed: True if a new row of bubbles was pushed on the board after the shot.
+    """
+    def __init__(self, cell, popped, dropped, score_delta):
+        self.cell = cell
+        self.popped = popped
+        self.dropped = dropped
+        self.score_delta = score_delta
+        self.game_over = None
+        self.level_complete = False
+        self.pushed = False
+
+
+class GameEngine:
+    """
+    The game simulation, without any display: no window, fonts or delays are needed to play.
+    Attributes:
+        - seed: Seed of the game, enough to replay it with the angles of its shots.
+        - resumed: True if the game was continued from a snapshot, so it cannot be replayed from its seed.
+        - rng: Random generator every board of the game is drawn from.
+        - level: Current game level.
+        - board: The current Gameboard.
+        - score: The Score of the game.
+        - shooter: The Shooter holding the bubble about to be shot.
+        - shots: Number of shots fired on the current board.
+        - game_over: None while the game goes on, otherwise the cause of the game over.
+        - landings: LandingTable of the current board, built the first time a landing is predicted.
+        - preview: (board, styles, bubbles) of the last preview of the next bubbles, None before the first one.
+    """
+    def __init__(self, seed=None, level=1):
+        """
+        Starts a new game.
+
+        Args:
+            seed (int): Seed of the game, a random one if not given.
+            level (int): Starting level.
+        """
+        self.seed = seed if seed is not None else random.randrange(1 << 63)
+        self.rng = random.Random(self.seed)
+        self.resumed = False
+        self.preview = None
+        self.score = Score(20)
+        self.shooter = Shooter()
+        self.game_over = None
+        self.start_level(level)
+
+    @classmethod
+    def resume(cls, seed, rng, board, score, shots, bubble):
+        """
+        Continues a saved game.
+
+        Args:
+            seed (int): Seed the game was started with.
+            rng (random.Random): Random generator of the game, in the state it was saved in.
+            board (Gameboard): The board of the current level.
+            score (int): The score.
+            shots (int): Number of shots fired on the board.
+            bubble (Bubble): The bubble in the shooter.
+
+        Returns:
+            GameEngine: The game.
+        """
+        game = cls.__new__(cls)
+        game.seed = seed
+        game.rng = rng
+        game.resumed = True
+        game.preview = None
+        game.score = Score(score)
+        game.shooter = Shooter()
+        game.game_over = None
+        game.level = board.level
+        game.board = board
+        game.shots = shots
+        game.landings = None
+        game.shooter.set_bubble(bubble)
+        return game
+
+    def start_level(self, level):
+        """
+        Creates the board for a level and loads the shooter with its first bubble.
+
+        Args:
+            level (int): The level to start.
+        """
+        self.level = level
+        self.board = Gameboard(level, self.rng)
+        self.shots = 0
+        self.landings = None
+        self.shooter.set_bubble(self.board.take_bubble())
+
+    def next_bubbles(self):
+        """
+        Returns the bubbles coming after the one in the shooter, as many as the queue previews.
+        They are only made again when the upcoming styles change.
+
+        Returns:
+            list: The bubbles, the next one first.
+        """
+        queue = self.board.bubbles_queue
+        styles = queue.peek(queue.lookahead)
+        if self.preview is None or self.preview[0] is not self.board or self.preview[1] != styles:
+            self.preview = (self.board, styles, [self.board.make_bubble(style) for style in styles])
+        return self.preview[2]
+
+    def next_bubble(self):
+        """
+        Returns:
+            Bubble: The bubble coming after the one in the shooter.
+        """
+        return self.next_bubbles()[0]
+
+    def aim(self, angle):
+        """
+        Resolves where a shot at the given angle would go, without playing it.
+
+        Args:
+            angle (float): Shooter angle in degrees (0 is right, 90 is straight up).
+
+        Returns:
+            ShotPath: The resolved path of the shot.
+        """
+        self.shooter.angle = angle
+        dx, dy = self.shooter.shoot()
+        return resolve_shot(self.board, self.shooter.position[0], self.shooter.position[1], dx, dy)
+
+    def predict_landing(self, angle=None):
+        """
+        Looks up where a shot would land, without resolving it.
+        The prediction is made at the resolution of the landing table.
+
+        Args:
+            angle (float): Shooter angle in degrees, the current angle of the shooter if not given.
+
+        Returns:
+            tuple or None: (row, column) of the landing cell, or None if the shot cannot land.
+        """
+        if self.landings is None:
+            self.landings = LandingTable(self.board, self.shooter.position[0], self.shooter.position[1])
+        return self.landings.landing(self.shooter.angle if angle is None else angle)
+
+    def shoot(self, angle):
+        """
+        Plays a shot at the given angle.
+
+        Args:
+            angle (float): Shooter angle in degrees (0 is right, 90 is straight up).
+
+        Returns:
+            ShotOutcome: What the shot did.
+        """
+        return self.land(self.aim(angle))
+
+    def land(self, path):
+        """
+        Plays a shot whose path was already resolved, e.g. after animating it.
+
+        Args:
+            path (ShotPath): The resolved path of the shot.
+
+        Returns:
+            ShotOutcome: What the shot did.
+        """
+        board, bubble = self.board, self.shooter.bubble
+        previous_score = self.score.score
+        popped, dropped = [], []
+
+        if path.cell is not None and not path.game_over:
+            i, j = path.cell
+            board.place_bubble(i, j, bubble.fillcolor, bubble.outline)
+            popped, dropped = board.update_after_hit(i, j, self.score)
+
+        outcome = ShotOutcome(path.cell, popped, dropped, self.score.score - previous_score)
+        self.shots += 1
+        if self.landings is not None and path.cell is not None and not path.game_over:
+            self.landings.update([path.cell] + popped + dropped)
+
+        if path.game_over:
+            outcome.game_over = self.game_over = 'last-row-hit'
+            return outcome
+
+        if board.is_empty():
+            outcome.level_complete = True
+            self.start_level(self.level + 1)
+            return outcome
+
+        if self.shots % settings().push_interval == 0:
+            outcome.pushed = True
+            if board.update_gameboard():
+                outcome.game_over = self.game_over = 'board-full'
+                return outcome
+            if self.landings is not None:
+                self.landings.refresh()
+
+        # Load the shooter with the next bubble of the queue, in a style still on the board
+        self.shooter.set_bubble(board.take_bubble())
+        return outcome
@@ -1,15 +1,74 @@
+import heapq
 import math
 import random
+from array import array
+from collections import deque
 
 import pygame
 
 import styles
+from config import settings
+from levelpack import active_pack
 from small_math import calculate_bubble_position, directions_for_pos, wdtcol_percentages_for_level
-from styles import colors, getProp, randomItemFrom, darker_colors, ligther_colors, window_size, bubble_window_size
+from styles import colors, window_size, bubble_window_size, palette_for, to_rgb
+from render import bubble_sprite, sprite_topleft
+from trajectory import resolve_shot
 
 # Get window dimensions for the game
 WINDOW_WIDTH, WINDOW_HEIGHT = window_size()
 
+# Flat neighbor indices of every cell, keyed by the dimensions of the board
+_adjacency = {}
+# Pixel positions of every cell, keyed by the dimensions of the board and the settings placing it
+_layouts = {}
+
+
+def adjacency(rows, cols):
+    """
+    Returns the flat indices of the neighbors of every cell of a board, computed once per board size.
+
+    Args:
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+
+    Returns:
+        list: For every flat cell index, a tuple of the flat indices of its neighbors.
+    """
+    if (rows, cols) not in _adjacency:
+        _adjacency[rows, cols] = [
+            tuple((i + di) * cols + j + dj for di, dj in directions_for_pos(i)
+                  if 0 <= i + di < rows and 0 <= j + dj < cols)
+            for i in range(rows) for j in range(cols)]
+    return _adjacency[rows, cols]
+
+
+def layout(rows, cols):
+    """
+    Returns the pixel positions of the cells of a board with the current settings, computed once per board size.
+    The arrays are shared by the boards of the same size and must not be changed.
+
+    Args:
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+
+    Returns:
+        tuple: Flat arrays of the x and y coordinates of the cells' centers, and the list of their sprites' top-left
+            corners.
+    """
+    config = settings()
+    key = (rows, cols, config.bubble_radius, config.margin_left, config.margin_top)
+    if key not in _layouts:
+        xcoords, ycoords = array('d'), array('d')
+        for i in range(rows):
+            for j in range(cols):
+                xcoord, ycoord = calculate_bubble_position(i, j)
+                xcoords.append(xcoord + config.margin_left)
+                ycoords.append(ycoord + config.margin_top)
+        topleft = [sprite_topleft(x, y, config.bubble_radius) for x, y in zip(xcoords, ycoords)]
+        _layouts[key] = (xcoords, ycoords, topleft)
+    return _layouts[key]
+
+
 class Bubble:
     """
     Represents an individual bubble in the game.
@@ -20,7 +79,7 @@ class Bubble:
         - radius: Radius of the bubble.
         - xCoord, yCoord: Coordinates of the bubble's center.
     """
-    def __init__(self, state, colorset, i, j):
+    def __init__(self, state, colorset, i, j, rng=random):
         """
         Initializes a bubble's attributes.
 
@@ -29,14 +88,17 @@ class Bubble:
             colorset (list): A set of colors available for the bubble.
             i (int): Row index of the bubble.
             j (int): Column index of the bubble.
+            rng (random.Random): The random generator used to pick the color.
         """
-        self.fillcolor, self.outline = colors()['background'], colors()['background']
+        self.fillcolor = self.outline = to_rgb(colors()['background'])
         self.outline_width = 3  # Thickness of the bubble's outline
         if state != 'clear':
-            self.set_col(colorset)  # Set a random color if state is not clear
-        self.radius = styles.getGenProp('bubble-radius')  # Set the bubble radius
-        self.xCoord = calculate_bubble_position(i, j)[0] + getProp('margin-left')  # X-coordinate
-        self.yCoord = calculate_bubble_position(i, j)[1] + getProp('margin-top')  # Y-coordinate
+            self.set_col(colorset, rng)  # Set a random color if state is not clear
+        config = settings()
+        self.radius = config.bubble_radius  # Set the bubble radius
+        xcoord, ycoord = calculate_bubble_position(i, j)
+        self.xCoord = xcoord + config.margin_left  # X-coordinate
+        self.yCoord = ycoord + config.margin_top  # Y-coordinate
 
     def set_exact_col(self, fillc, outc):
         self.fillcolor = fillc
@@ -60,14 +122,16 @@ class Bubble:
         """
         return True if self.fillcolor == self.outline else False
 
-    def set_col(self, colorset):
+    def set_col(self, colorset, rng=random):
         """
         Assigns a random color to the bubble from a given color set.
 
         Args:
             colorset (list): A set of colors available for the bubble.
+            rng (random.Random): The random generator used to pick the color.
         """
-        self.fillcolor, self.outline = randomItemFrom(ligther_colors(colorset)), randomItemFrom(darker_colors(colorset))
+        palette = palette_for(colorset)
+        self.fillcolor, self.outline = palette.styles[palette.random_style(rng)]
 
     def set_style(self, fillC, outC):
         """
@@ -83,7 +147,7 @@ class Bubble:
         """
         Clears the bubble, resetting its color to the background color.
         """
-        self.fillcolor = self.outline = colors()['background']
+        self.fillcolor = self.outline = to_rgb(colors()['background'])
 
     def draw(self, window):
         """
@@ -91,39 +155,463 @@ class Bubble:
 
         Args:
             window (pygame.Surface): The window surface where the bubble is drawn.
+
+        Returns:
+            pygame.Rect: The area of the window that was drawn.
+        """
+        sprite = bubble_sprite(self.fillcolor, self.outline, self.radius, self.outline_width)
+        return window.blit(sprite, sprite_topleft(self.xCoord, self.yCoord, self.radius))
+
+
+class BoardCell:
+    """
+    A lightweight view of a single cell of a Gameboard.
+    It exposes the same interface as a Bubble, but reads and writes the board's compact storage.
+    Attributes:
+        - board: The Gameboard owning the cell.
+        - i, j: Row and column index of the cell.
+        - index: Flat index of the cell in the board's storage.
+    """
+    __slots__ = ('board', 'i', 'j', 'index')
+    outline_width = 3  # Thickness of the bubble's outline
+
+    def __init__(self, board, i, j):
+        """
+        Initializes the view of a cell.
+
+        Args:
+            board (Gameboard): The board owning the cell.
+            i (int): Row index of the cell.
+            j (int): Column index of the cell.
+        """
+        self.board, self.i, self.j = board, i, j
+        self.index = board.index(i, j)
+
+    @property
+    def fillcolor(self):
+        return self.board.styles[self.board.grid[self.index]][0]
+
+    @property
+    def outline(self):
+        return self.board.styles[self.board.grid[self.index]][1]
+
+    @property
+    def radius(self):
+        return self.board.radius
+
+    @property
+    def xCoord(self):
+        return self.board.xcoords[self.index]
+
+    @property
+    def yCoord(self):
+        return self.board.ycoords[self.index]
+
+    def is_clear(self):
+        """
+        Checks if the cell is clear.
+
+        Returns:
+            bool: True if the cell is clear, False otherwise.
+        """
+        return self.board.grid[self.index] == 0
+
+    def set_col(self, colorset):
+        """
+        Assigns a random color to the cell from a given color set.
+
+        Args:
+            colorset (dict): A set of colors available for the bubble.
         """
-        center = (self.xCoord, self.yCoord)
-        pygame.draw.circle(window, self.outline, center, self.radius)  # Draw outline
-        pygame.draw.circle(window, self.fillcolor, center, self.radius - self.outline_width)  # Draw fill
+        if colorset is self.board.colorSet:
+            self.board.set_cell(self.index, self.board.random_style())
+        else:
+            palette = palette_for(colorset)
+            self.set_style(*palette.styles[palette.random_style(self.board.rng)])
+
+    def set_style(self, fillC, outC):
+        """
+        Sets specific colors for the cell.
+
+        Args:
+            fillC (str): Color for the fill.
+            outC (str): Color for the outline.
+        """
+        self.board.set_cell(self.index, self.board.style_index(fillC, outC))
+
+    def set_exact_col(self, fillc, outc):
+        self.set_style(fillc, outc)
+
+    def set_clear(self):
+        """
+        Clears the cell.
+        """
+        self.board.set_cell(self.index, 0)
+        self.board.settled = False  # The cleared bubble may have held others in place
+
+    def draw(self, window):
+        """
+        Renders the cell's bubble on the game window.
+
+        Args:
+            window (pygame.Surface): The window surface where the bubble is drawn.
+
+        Returns:
+            pygame.Rect: The area of the window that was drawn.
+        """
+        return self.board.draw_cell(window, self.index)
+
+
+class BoardRow:
+    """
+    A view of one row of a Gameboard, indexable by column.
+    """
+    __slots__ = ('board', 'i')
+
+    def __init__(self, board, i):
+        self.board, self.i = board, i
+
+    def __len__(self):
+        return self.board.cols
+
+    def __getitem__(self, j):
+        if not 0 <= j < self.board.cols:
+            raise IndexError('column index out of range')
+        return BoardCell(self.board, self.i, j)
+
+    def __iter__(self):
+        return (BoardCell(self.board, self.i, j) for j in range(self.board.cols))
+
+
+class BoardMatrix:
+    """
+    A view of a Gameboard's cells supporting matrix[i][j]-style access.
+    """
+    __slots__ = ('board',)
+
+    def __init__(self, board):
+        self.board = board
+
+    def __len__(self):
+        return self.board.rows
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.board.rows:
+            raise IndexError('row index out of range')
+        return BoardRow(self.board, i)
+
+    def __iter__(self):
+        return (BoardRow(self.board, i) for i in range(self.board.rows))
+
+
+class BubbleQueue:
+    """
+    The styles of the shooter's next bubbles, drawn from the board's random generator only when they are needed:
+    the queue never runs out and costs nothing to create. Bubbles are only made for the shooter and the preview.
+    Attributes:
+        - board: The Gameboard the bubbles are shot at.
+        - upcoming: Style indices already drawn, the next one first.
+        - lookahead: Number of upcoming styles shown in the preview.
+        - bias: Chance for a style to be drawn among the styles on the board rather than the whole palette.
+    """
+    def __init__(self, board, upcoming=(), lookahead=None, bias=None):
+        """
+        Args:
+            board (Gameboard): The board the bubbles are shot at.
+            upcoming (iterable): Style indices already drawn, e.g. from a saved game.
+            lookahead (int): Number of upcoming styles shown in the preview, the preview_bubbles setting if not given.
+            bias (float): Chance to draw among the styles on the board, the queue_bias setting if not given.
+        """
+        config = settings()
+        self.board = board
+        self.upcoming = deque(upcoming)
+        self.lookahead = max(1, config.preview_bubbles if lookahead is None else lookahead)
+        self.bias = config.queue_bias if bias is None else bias
+
+    def __len__(self):
+        return len(self.upcoming)
+
+    def __iter__(self):
+        return iter(self.upcoming)
+
+    def draw_style(self):
+        """
+        Draws the style of a new bubble.
+
+        Returns:
+            int: The index of the style.
+        """
+        board = self.board
+        if self.bias and board.occupied and board.rng.random() < self.bias:
+            return board.rng.choice(board.present_styles())
+        return board.random_style()
+
+    def peek(self, count=1):
+        """
+        Returns the styles of the next bubbles, drawing them if needed.
+
+        Args:
+            count (int): Number of styles.
+
+        Returns:
+            list: The style indices, the next one first.
+        """
+        while len(self.upcoming) < count:
+            self.upcoming.append(self.draw_style())
+        return [self.upcoming[n] for n in range(count)]
+
+    def pop(self):
+        """
+        Takes the style of the next bubble. The taken style and the styles of the preview are drawn again
+        among the styles on the board if theirs is gone, unless the board is empty.
+
+        Returns:
+            int: The index of the style.
+        """
+        self.peek(self.lookahead + 1)
+        board = self.board
+        if board.occupied:
+            present = None
+            for n, style in enumerate(self.upcoming):
+                if n > self.lookahead:
+                    break
+                if not board.style_counts[style]:
+                    present = present or board.present_styles()
+                    self.upcoming[n] = board.rng.choice(present)
+        return self.upcoming.popleft()
 
 
 class Gameboard:
     """
     Represents the entire gameboard.
     Attributes:
-        - height, width: Dimensions of the board in terms of bubbles.
+        - rows, cols: Dimensions of the board in terms of bubbles.
         - level: Current game level.
         - colorSet: Color palette for the current level.
-        - matrix: 2D list of Bubble objects representing the gameboard.
-        - bubbles_queue: Queue of bubbles for the shooter.
+        - styles: List of (fill, outline) color pairs; index 0 is the clear style.
+        - grid: Flat view holding the style index of every cell (0 means clear), row by row from the top.
+        - storage: Array the grid is a window of, with spare rows above it: a row push slides the window
+          up over the spare rows instead of moving every cell.
+        - start: Index in storage of the first cell of the grid.
+        - occupied: Number of bubbles on the board.
+        - row_counts: Number of bubbles on every row.
+        - style_counts: Number of bubbles of every style, indexed like styles.
+        - xcoords, ycoords: Flat arrays holding the pixel coordinates of every cell.
+        - adjacent: Flat indices of the neighbors of every cell, shared by the boards of the same size.
+        - matrix: 2D view of the cells, behaving like a matrix of Bubble objects.
+        - bubbles_queue: BubbleQueue of the styles of the shooter's next bubbles.
+        - rng: Random generator the board draws its bubbles from.
+        - settled: True while every bubble on the board is known to be attached to the top row.
+        - dirty: Flat indices of the cells changed since the board was last rendered.
+        - redraw_all: True if the whole board changed since it was last rendered.
     """
-    def __init__(self, lvlcount):
+    def __init__(self, lvlcount, rng=None):
         """
         Initializes the gameboard with bubbles and level-specific settings.
 
         Args:
             lvlcount (int): Current game level.
+            rng (random.Random): Random generator for the board, the global one if not given.
+                It draws the board from the level pack of the settings if there is one, or generates it.
         """
-        self.height, self.width = bubble_window_size()  # Dimensions of the board
+        rng = rng if rng is not None else random
+        pack = active_pack()
+        if pack is not None and pack.count(lvlcount):
+            # Load one of the level's boards from the level pack
+            colorset, grid = pack.pick(lvlcount, rng)
+            self.setup(lvlcount, rng, colorset)
+            self.set_grid(grid)
+        else:
+            self.setup(lvlcount, rng, styles.colorForLevel(lvlcount, rng))
+            wdth_percentage, col_percentage = wdtcol_percentages_for_level(lvlcount)
+            self.random_init(wdth_percentage, col_percentage)  # Populate board with random bubbles
+        self.settled = False  # The random init may leave floating bubbles
+
+    def setup(self, lvlcount, rng, colorset):
+        """
+        Sets up an empty board for a level, with every cell clear.
+
+        Args:
+            lvlcount (int): Current game level.
+            rng (random.Random): Random generator for the board, the global one if None.
+            colorset (dict): Color set of the level.
+        """
+        self.rng = rng if rng is not None else random
+        self.cols, self.rows = bubble_window_size()  # Dimensions of the board
         self.level = lvlcount  # Current level
-        self.colorSet = styles.colorForLevel(lvlcount)  # Color set for the level
-        # Create a matrix of bubbles initialized as 'clear'
-        self.matrix = [[Bubble('clear', self.colorSet, i, j) for j in range(self.height)] for i in range(self.width)]
+        self.colorSet = colorset  # Color set for the level
+        self.radius = settings().bubble_radius
+
+        # Every combination of a light fill and a dark outline is a style, index 0 stays clear
+        self.palette = palette_for(self.colorSet)
+        self.styles = list(self.palette.styles)
+        self.style_lookup = {style: index for index, style in enumerate(self.styles)}
+
+        # Create the board storage with every cell initialized as 'clear'
+        spare = max(2, self.rows)  # Spare rows the grid slides over when rows are pushed
+        self.storage = array('B', bytes((self.rows + spare) * self.cols))
+        self.start = spare * self.cols
+        self.grid = memoryview(self.storage)[self.start:self.start + self.rows * self.cols]
+        self.occupied = 0
+        self.row_counts = [0] * self.rows
+        self.style_counts = [0] * len(self.styles)
+        self.xcoords, self.ycoords, self.topleft = layout(self.rows, self.cols)
+        self.adjacent = adjacency(self.rows, self.cols)
+        self.matrix = BoardMatrix(self)
+        self.dirty = set()
+        self.redraw_all = True
+        self.settled = True
+        self.bubbles_queue = BubbleQueue(self)  # Shooter's bubble queue, drawn as it goes
+
+    @classmethod
+    def restore(cls, lvlcount, rng, colorset, board_styles, grid, queue, settled=False):
+        """
+        Rebuilds a saved board without drawing anything from the random generator.
 
-        wdth_percentage, col_percentage = wdtcol_percentages_for_level(lvlcount)
+        Args:
+            lvlcount (int): Level of the board.
+            rng (random.Random): Random generator for the board.
+            colorset (dict): Color set of the level.
+            board_styles (list): (fill, outline) RGB pairs of the board, index 0 being the clear style.
+            grid (array.array): Style index of every cell, taken over by the board.
+            queue (list): Style indices of the bubbles already drawn in the shooter's queue.
+            settled (bool): True if every bubble of the board is attached to the top row.
 
-        self.random_init(0.4, 0.3)  # Populate board with random bubbles
-        self.bubbles_queue = [Bubble('active', self.colorSet, 0, 0) for _ in range(100)]  # Shooter's bubble queue
+        Returns:
+            Gameboard: The board.
+        """
+        board = cls.__new__(cls)
+        board.setup(lvlcount, rng, colorset)
+        if len(grid) != len(board.grid):
+            raise ValueError(f"Saved board has {len(grid)} cells, expected {board.rows} x {board.cols}")
+        board.styles = list(board_styles)
+        board.style_lookup = {style: index for index, style in enumerate(board.styles)}
+        board.set_grid(grid)
+        board.settled = settled
+        board.bubbles_queue = BubbleQueue(board, queue)
+        return board
+
+    def make_bubble(self, style):
+        """
+        Creates a shooter bubble of the given style.
+
+        Args:
+            style (int): Style index of the bubble.
+
+        Returns:
+            Bubble: The bubble.
+        """
+        bubble = Bubble('clear', self.colorSet, 0, 0)
+        bubble.set_style(*self.styles[style])
+        return bubble
+
+    def index(self, i, j):
+        """
+        Returns the flat storage index of the cell (i, j).
+        """
+        return i * self.cols + j
+
+    def set_cell(self, k, style):
+        """
+        Stores a style in the cell with flat index k and marks the cell for redrawing.
+
+        Args:
+            k (int): Flat index of the cell.
+            style (int): Style index, 0 to clear the cell.
+        """
+        old = self.grid[k]
+        if old != style:
+            # Keep the counters up to date
+            row = k // self.cols
+            if old:
+                self.occupied -= 1
+                self.row_counts[row] -= 1
+                self.style_counts[old] -= 1
+            if style:
+                self.occupied += 1
+                self.row_counts[row] += 1
+                self.style_counts[style] += 1
+            self.grid[k] = style
+        self.dirty.add(k)
+
+    def set_grid(self, grid):
+        """
+        Replaces every cell at once, e.g. to restore a saved board, and counts the bubbles again.
+
+        Args:
+            grid (array.array or bytes): Style index of every cell.
+        """
+        self.grid[:] = grid if isinstance(grid, array) else array('B', grid)
+        self.recount()
+        self.redraw_all = True
+
+    def recount(self):
+        """
+        Counts the bubbles of the board again, after its cells were written directly.
+        """
+        cells, cols = self.grid.tobytes(), self.cols
+        self.style_counts = [cells.count(style) for style in range(len(self.styles))]
+        self.occupied = len(cells) - self.style_counts[0]
+        self.style_counts[0] = 0
+        self.row_counts = [cols - cells.count(0, k, k + cols) for k in range(0, len(cells), cols)]
+
+    def present_styles(self):
+        """
+        Returns:
+            list: The indices of the styles of the bubbles on the board.
+        """
+        return [style for style, count in enumerate(self.style_counts) if count]
+
+    def take_bubble(self):
+        """
+        Takes the next bubble of the shooter's queue.
+
+        Returns:
+            Bubble: The bubble for the shooter.
+        """
+        return self.make_bubble(self.bubbles_queue.pop())
+
+    def cell_rect(self, k):
+        """
+        Returns the area of the window covered by the cell with flat index k.
+
+        Args:
+            k (int): Flat index of the cell.
+
+        Returns:
+            pygame.Rect: The bounding rectangle of the cell's bubble.
+        """
+        size = 2 * math.ceil(self.radius) + 1
+        return pygame.Rect(self.topleft[k], (size, size))
+
+    def random_style(self):
+        """
+        Picks a random non-clear style of the level's palette.
+
+        Returns:
+            int: The index of the chosen style.
+        """
+        return self.palette.random_style(self.rng)
+
+    def style_index(self, fillC, outC):
+        """
+        Returns the style index of a (fill, outline) pair, registering the pair if it is new.
+
+        Args:
+            fillC (str or tuple): Color for the fill, as hex or RGB.
+            outC (str or tuple): Color for the outline, as hex or RGB.
+
+        Returns:
+            int: The index of the style.
+        """
+        style = (to_rgb(fillC), to_rgb(outC))
+        if style not in self.style_lookup:
+            if style[0] == style[1]:
+                return 0
+            self.style_lookup[style] = len(self.styles)
+            self.styles.append(style)
+            self.style_counts.append(0)
+        return self.style_lookup[style]
 
     def find_cluster(self, start_i, start_j, color, outcol):
         """
@@ -138,23 +626,28 @@ class Gameboard:
         Returns:
             list: A list of (row, column) tuples representing the cluster of bubbles.
         """
-        visited = set()
+        style = self.style_lookup.get((color, outcol), 0)
+        if style == 0:
+            return []
+
+        if not (0 <= start_i < self.rows and 0 <= start_j < self.cols):
+            return []
+
+        grid, adjacent = self.grid, self.adjacent
+        visited = set()  # Grows with the cluster, not with the board
         cluster = []
-        stack = [(start_i, start_j)]  # Stack for depth-first search
+        stack = [self.index(start_i, start_j)]  # Stack for depth-first search
 
         while stack:
-            i, j = stack.pop()
-            if (i, j) in visited:
+            k = stack.pop()
+            if k in visited:
                 continue
-            visited.add((i, j))
+            visited.add(k)
 
-            if 0 <= i < self.width and 0 <= j < self.height:
-                bubble = self.matrix[i][j]
-                if bubble.fillcolor == color and bubble.outline == outcol and not bubble.is_clear():
-                    cluster.append((i, j))  # Add bubble to the cluster
-                    # Add neighboring bubbles to the stack
-                    neighbors = self.get_neighbors(i, j)
-                    stack.extend(neighbors)
+            if grid[k] == style:
+                cluster.append(divmod(k, self.cols))  # Add bubble to the cluster
+                # Add neighboring bubbles to the stack
+                stack.extend(adjacent[k])
 
         return cluster
 
@@ -170,7 +663,7 @@ class Gameboard:
             list: A list of (row, column) tuples representing neighbors.
         """
         return [(i + di, j + dj) for di, dj in directions_for_pos(i)
-                if 0 <= i + di < self.width and 0 <= j + dj < self.height]
+                if 0 <= i + di < self.rows and 0 <= j + dj < self.cols]
 
     def remove_cluster(self, cluster):
         """
@@ -180,7 +673,7 @@ class Gameboard:
             cluster (list): List of (row, column) tuples representing the cluster.
         """
         for i, j in cluster:
-            self.matrix[i][j].set_clear()
+            self.set_cell(self.index(i, j), 0)
 
     def update_after_hit(self, i, j, score):
         """
@@ -190,47 +683,110 @@ class Gameboard:
             i (int): Row index of the placed bubble.
             j (int): Column index of the placed bubble.
             score (object): The score object to be updated.
+
+        Returns:
+            tuple: The list of popped cells and the list of dropped (floating) cells.
         """
-        bubble = self.matrix[i][j]
-        color = bubble.fillcolor
+        color, outcol = self.styles[self.grid[self.index(i, j)]]
 
         # Find connected bubbles of the same color
-        cluster = self.find_cluster(i, j, color, bubble.outline)
+        cluster = self.find_cluster(i, j, color, outcol)
 
         # Remove the cluster if it meets the minimum size
         if len(cluster) >= 3:  # Minimum cluster size
             self.remove_cluster(cluster)
             score.update(cluster)
+        else:
+            cluster = []
+
+        # Clear floating bubbles
+        if not self.settled:
+            self.settled = True
+            return cluster, self.remove_floating_bubbles()
+        return cluster, self.remove_detached_bubbles(cluster)
+
+    def find_detached(self, removed):
+        """
+        Finds the bubbles that lost their attachment to the top row because some bubbles were removed.
+        Adding bubbles never detaches anything, so only the bubbles around the removed ones need to be
+        checked: from each of them, a search heading for the top row first either reaches it or explores
+        the whole group of bubbles that is now floating.
+
+        Args:
+            removed (list): (row, column) tuples of the removed bubbles.
+
+        Returns:
+            list: A list of (row, column) tuples of the detached bubbles.
+        """
+        grid, adjacent, cols = self.grid, self.adjacent, self.cols
+        anchored, detached = set(), set()
 
-        self.remove_floating_bubbles()  # Clear floating bubbles
+        seeds = {nk for i, j in removed for nk in adjacent[self.index(i, j)] if grid[nk]}
+        for seed in seeds:
+            if seed in anchored or seed in detached:
+                continue
+            visited = {seed}
+            heap = [seed]  # Cells closest to the top row (lowest flat index) are explored first
+            reached_top = False
+            while heap:
+                k = heapq.heappop(heap)
+                if k < cols or k in anchored:
+                    reached_top = True
+                    break
+                for nk in adjacent[k]:
+                    if nk not in visited and grid[nk]:
+                        visited.add(nk)
+                        heapq.heappush(heap, nk)
+
+            if reached_top:
+                anchored |= visited
+            else:
+                detached |= visited
+        return [divmod(k, cols) for k in detached]
+
+    def remove_detached_bubbles(self, removed):
+        """
+        Clears the bubbles detached from the top row by the removal of some bubbles.
+
+        Args:
+            removed (list): (row, column) tuples of the removed bubbles.
+
+        Returns:
+            list: A list of (row, column) tuples of the cleared bubbles.
+        """
+        detached = self.find_detached(removed) if removed else []
+        self.remove_cluster(detached)
+        return detached
 
     def remove_floating_bubbles(self):
         """
         Clears bubbles that are not connected to the top row.
+
+        Returns:
+            list: A list of (row, column) tuples of the cleared bubbles.
         """
-        visited = set()
-        floating = set()
+        grid, adjacent = self.grid, self.adjacent
+        visited = bytearray(len(grid))
 
-        stack = [(0, j) for j in range(self.height) if not self.matrix[0][j].is_clear()]
+        stack = [k for k in range(self.cols) if grid[k]]
 
         while stack:
-            i, j = stack.pop()
-            if (i, j) in visited:
+            k = stack.pop()
+            if visited[k]:
                 continue
-            visited.add((i, j))
+            visited[k] = 1
 
-            neighbors = self.get_neighbors(i, j)
-            for ni, nj in neighbors:
-                if not self.matrix[ni][nj].is_clear() and (ni, nj) not in visited:
-                    stack.append((ni, nj))
+            for nk in adjacent[k]:
+                if grid[nk] and not visited[nk]:
+                    stack.append(nk)
 
-        for i in range(self.width):
-            for j in range(self.height):
-                if (i, j) not in visited and not self.matrix[i][j].is_clear():
-                    floating.add((i, j))
-
-        for i, j in floating:
-            self.matrix[i][j].set_clear()
+        # Every occupied cell the search did not reach is floating
+        floating = []
+        for k, style in enumerate(grid):
+            if style and not visited[k]:
+                self.set_cell(k, 0)
+                floating.append(divmod(k, self.cols))
+        return floating
 
     def random_init(self, wdtpercentage, colpercentage):
         """
@@ -240,17 +796,18 @@ class Gameboard:
             wdtpercentage (float): Percentage of width to fill with bubbles.
             colpercentage (float): Percentage of columns to fill.
         """
-        no_lines = int(self.height * colpercentage) +(0 if self.level==1 else 1)
+        no_lines = min(self.rows, int(self.rows * colpercentage) + (0 if self.level == 1 else 1))
 
-        for i in range(no_lines):
-            for j in range(len(self.matrix[i])):
-                self.matrix[i][j].set_col(self.colorSet)
+        for k in range(no_lines * self.cols):
+            self.grid[k] = self.random_style()
 
         for i in range(no_lines):
-            no_randoms = max(int(self.width / 2), int(wdtpercentage * (no_lines - 2 * i)))
-            who_to_col = random.choices(range(self.width), k=no_randoms)
+            no_randoms = max(int(self.cols / 2), int(wdtpercentage * (no_lines - 2 * i)))
+            who_to_col = self.rng.choices(range(self.cols), k=no_randoms)
             for j in who_to_col:
-                self.matrix[i][j].set_clear()
+                self.grid[self.index(i, j)] = 0
+        self.recount()
+        self.redraw_all = True
 
     def draw(self, window):
         """
@@ -259,14 +816,39 @@ class Gameboard:
         Args:
             window (pygame.Surface): The window surface where the gameboard is drawn.
         """
-        for x in range(self.width):
-            for y in range(self.height):
-                if not self.matrix[x][y].is_clear():
-                    self.matrix[x][y].draw(window)
+        topleft = self.topleft
+        sprites = [self.style_sprite(style) for style in range(len(self.styles))]
+        window.blits([(sprites[style], topleft[k]) for k, style in enumerate(self.grid) if style], doreturn=False)
+
+        bubble_diam = self.radius * 2
+        pygame.draw.line(window, colors()['brown'], (0, bubble_diam * self.rows + 15),
+                         (settings().window_width, bubble_diam * self.rows + 15), 3)
+
+    def draw_cell(self, window, k):
+        """
+        Renders the bubble stored in the cell with flat index k.
+
+        Args:
+            window (pygame.Surface): The window surface where the bubble is drawn.
+            k (int): Flat index of the cell.
+
+        Returns:
+            pygame.Rect: The area of the window that was drawn.
+        """
+        return window.blit(self.style_sprite(self.grid[k]), self.topleft[k])
 
-        bubble_diam = styles.getGenProp('bubble-radius') * 2
-        pygame.draw.line(window, colors()['brown'], (0, bubble_diam * self.height + 15),
-                         (getProp('window-width'), bubble_diam * self.height + 15), 3)
+    def style_sprite(self, style):
+        """
+        Returns the pre-rendered bubble of a style.
+
+        Args:
+            style (int): Style index.
+
+        Returns:
+            pygame.Surface: The bubble on a transparent surface.
+        """
+        fillcolor, outline = self.styles[style]
+        return bubble_sprite(fillcolor, outline, self.radius, BoardCell.outline_width)
 
     def is_bubble_below_board(self, y_position):
         """
@@ -278,7 +860,7 @@ class Gameboard:
         Returns:
             bool: True if the bubble is below the board, False otherwise.
         """
-        return y_position >= self.height
+        return y_position >= self.rows
 
     def find_target_row(self, col, dx, dy):
         """
@@ -293,12 +875,12 @@ class Gameboard:
         Returns:
             int: The row index of the target cell.
         """
-        x = self.width // 2  # Example, can be set to shooter's x position
+        x = self.cols // 2  # Example, can be set to shooter's x position
         y = 0  # Starting from the top row
 
-        while 0 <= x < self.width and 0 <= y < self.height:  # Iterate along the path
+        while 0 <= x < self.cols and 0 <= y < self.rows:  # Iterate along the path
             if int(x) == col:
-                if self.matrix[col][int(y)].is_clear():
+                if self.grid[self.index(int(y), col)] == 0:
                     return int(y + 1)
             x += dx * 5
             y += dy * 5
@@ -312,87 +894,87 @@ class Gameboard:
         :return: True if the game has ended, False if not
         '''
 
-        for y in range(self.height):
-            if not self.matrix[self.width-1][y].is_clear():
-                return True
-
-        for x in range(self.width-1,1,-1):
-            for y in range(self.height):
-                self.matrix[x][y].set_exact_col(self.matrix[x-2][y].fillcolor, self.matrix[x-2][y].outline)
-                self.matrix[x-2][y].set_clear()
+        if self.row_counts[-1]:
+            return True
 
-        for y in range(self.height):
-            self.matrix[0][y].set_col(self.colorSet)
-            self.matrix[1][y].set_col(self.colorSet)
+        last_row = self.index(self.rows - 1, 0)
+        dropped = self.grid[last_row - self.cols:last_row].tobytes()
+        if self.row_counts[-2]:
+            # Bubbles pushed off the board may have held others in place
+            self.settled = False
+
+        # Shift every row two rows down, keeping the hexagonal row parity: the grid window slides two rows up
+        # the storage, so only the new rows are written
+        size, pushed_size = len(self.grid), 2 * self.cols
+        if self.start < pushed_size:
+            # Out of spare rows: move the board back to the end of the storage, once every few pushes
+            end = len(self.storage)
+            self.storage[end - size:] = self.storage[self.start:self.start + size]
+            self.start = end - size
+        self.start -= pushed_size
+        self.grid = memoryview(self.storage)[self.start:self.start + size]
+        # Same draws as random_style, without a method call per cell
+        randrange, upper = self.rng.randrange, len(self.palette.styles)
+        pushed = bytes([randrange(1, upper) for _ in range(pushed_size)])
+        self.grid[:pushed_size] = pushed
+
+        # Count the bubbles pushed on and off the board, style by style
+        counts = self.style_counts
+        for style in range(1, len(counts)):
+            counts[style] += pushed.count(style) - dropped.count(style)
+        self.occupied += len(pushed) - self.row_counts[-2]
+        self.row_counts[2:] = self.row_counts[:-2]
+        self.row_counts[:2] = [self.cols, self.cols]
+        self.redraw_all = True
         return False
 
-    def use_shooter(self, shooter, window, score):
+    def use_shooter(self, shooter, score):
         """
-        Simulates the shooter bubble's trajectory and updates the game state.
+        Resolves the shooter bubble's trajectory and updates the game state right away.
 
         Args:
             shooter (object): The shooter object controlling the bubble.
-            window (pygame.Surface): The game window for rendering.
             score (object): The score object for tracking points.
 
         Returns:
             bool: True if the bubble is successfully shot, False otherwise.
         """
         dx, dy = shooter.shoot()
-        x, y = shooter.position[0], shooter.position[1]
-        bubble_radius = shooter.bubble.radius
-        bubble_outline = shooter.bubble.outline_width
-        hit = False
-        target_cell = None
-        no_iter = 0
-
-        while not hit:
-            no_iter += 1
-            x += dx * 5
-            y += dy * 5
+        path = resolve_shot(self, shooter.position[0], shooter.position[1], dx, dy)
+        return self.land_shot(path, shooter.bubble, score)
+
+    def land_shot(self, path, bubble, score):
+        """
+        Places a bubble at the end of its resolved path and updates the game state.
+
+        Args:
+            path (ShotPath): The resolved path of the shot.
+            bubble (Bubble): The bubble that was shot.
+            score (object): The score object for tracking points.
+
+        Returns:
+            bool: True if the bubble is successfully shot, False if it hit the last row.
+        """
+        if path.game_over:
+            return False
 
-            if x <= 0:
-                x = 0
-                dx = -dx
-            elif x >= getProp('window-width'):
-                x = getProp('window-width')
-                dx = -dx
-            elif y <= 0:
-                y = 0
-                target_cell = self.find_closest_free_top(x)
-                hit = True
-
-            if not hit:
-                for i in range(self.width):
-                    for j in range(self.height):
-                        bubble_x, bubble_y = self.matrix[i][j].xCoord, self.matrix[i][j].yCoord
-                        distance = math.sqrt((x - bubble_x) ** 2 + (y - bubble_y) ** 2)
-                        if distance <= 2 * bubble_radius + 2 * bubble_outline and not self.matrix[i][j].is_clear():
-                            target_cell = self.find_intersecting_neighbor(i, j, dx, dy, x, y)
-                            if i == self.width - 1:
-                                return False
-                            hit = True
-                            break
-
-            if not hit and no_iter%6 == 0:
-                shooter.bubble.set_coord(int(x), int(y))
-                shooter.bubble.draw(window)
-
-            pygame.display.update()
-            pygame.time.delay(10)
-
-        if hit:
-            if target_cell is None:
-                if self.check_last_row_collision(shooter.position[0], shooter.position[1], dx, dy):
-                    return False
-                target_cell = (0, 0) if dx < 0 else (0, self.width - 1)
-
-            i, j = target_cell
-            self.matrix[i][j].set_style(shooter.bubble.fillcolor, shooter.bubble.outline)
+        if path.cell is not None:
+            i, j = path.cell
+            self.place_bubble(i, j, bubble.fillcolor, bubble.outline)
             self.update_after_hit(i, j, score)
-            return True
+        return True
 
-        return False
+    def place_bubble(self, i, j, fillC, outC):
+        """
+        Places a bubble of the given colors in the cell (i, j).
+
+        Args:
+            i (int): Row index of the cell.
+            j (int): Column index of the cell.
+            fillC (str): Color for the fill.
+            outC (str): Color for the outline.
+        """
+        self.set_cell(self.index(i, j), self.style_index(fillC, outC))
 
     def check_last_row_collision(self, x, y, dx, dy):
         """
@@ -407,30 +989,7 @@ class Gameboard:
         Returns:
             bool: True if a collision occurs, False otherwise.
         """
-        bubble_radius = self.matrix[0][0].radius
-        bubble_outline = self.matrix[0][0].outline_width
-
-        while y < getProp('window-height'):
-            if x <= 0:
-                x = 0
-                dx = -dx
-            elif x >= getProp('window-width'):
-                x = getProp('window-width')
-                dx = -dx
-
-            if y >= (self.height - 1) * bubble_radius:
-                for i in range(self.width):
-                    if not self.matrix[i][self.height - 1].is_clear():
-                        bubble_x, bubble_y = self.matrix[i][self.height - 1].xCoord, self.matrix[i][self.height - 1].yCoord
-                        distance = math.sqrt((x - bubble_x) ** 2 + (y - bubble_y) ** 2)
-                        if distance <= 2 * bubble_radius + 2 * bubble_outline:
-                            return True
-                break
-
-            x += dx * 5
-            y += dy * 5
-
-        return False
+        return resolve_shot(self, x, y, dx, dy).game_over
 
     def find_intersecting_neighbor(self, i, j, dx, dy, shooter_x, shooter_y):
         """
@@ -459,18 +1018,18 @@ class Gameboard:
             ni, nj = i + di, j + dj
 
             # Ensure the neighbor is within bounds
-            if 0 <= ni < self.width and 0 <= nj < self.height:
-                neighbor = self.matrix[ni][nj]
+            if 0 <= ni < self.rows and 0 <= nj < self.cols:
+                nk = self.index(ni, nj)
 
                 # Check if the neighbor is clear
-                if neighbor.is_clear():
+                if self.grid[nk] == 0:
                     # Calculate the projection of the shooter's trajectory onto the neighbor
-                    neighbor_x, neighbor_y = neighbor.xCoord, neighbor.yCoord
+                    neighbor_x, neighbor_y = self.xcoords[nk], self.ycoords[nk]
                     distance_to_trajectory = abs(
                         (neighbor_y - shooter_y) * dx - (neighbor_x - shooter_x) * dy) / math.sqrt(dx ** 2 + dy ** 2)
 
                     # If the neighbor intersects the trajectory, return it
-                    if distance_to_trajectory <= self.matrix[ni][nj].radius + self.matrix[ni][nj].outline_width:
+                    if distance_to_trajectory <= self.radius + BoardCell.outline_width:
                         return (ni, nj)
 
         # If no valid neighbor is found, return None
@@ -490,9 +1049,9 @@ class Gameboard:
         closest_cell = None
         min_distance = float("inf")
 
-        for j in range(self.height):
-            if self.matrix[0][j].is_clear():
-                bubble_x = self.matrix[0][j].xCoord
+        for j in range(self.cols):
+            if self.grid[j] == 0:
+                bubble_x = self.xcoords[j]
                 distance = abs(x - bubble_x)
                 if distance < min_distance:
                     closest_cell = (0, j)
@@ -507,10 +1066,4 @@ class Gameboard:
         Returns:
             bool: True if all bubbles on the board are clear, False otherwise.
         """
-
-        for i in range(self.width):
-            for j in range(self.height):
-                if not self.matrix[i][j].is_clear():
-                    return False
-
-        return True
\ No newline at end of file
+        return self.occupied == 0
\ No newline at end of file
@@ -0,0 +1,200 @@
+import argparse
+import math
+import os
+import random
+import statistics
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from effects import Shooter
+from game_elements import Gameboard
+from levelpack import LevelPack, write_pack
+from trajectory import resolve_shot
+
+# A fair board uses its styles evenly enough and lets shots reach enough of its bubbles
+MIN_BALANCE = 0.6  # Effective number of styles used, as a share of the styles on the board
+MIN_REACHABLE = 0.2  # Share of the bubbles a shot can hit directly
+# Angles the reachable bubbles are found with, in degrees
+AIM_ANGLES = [5 + n for n in range(171)]
+
+
+def rate(board):
+    """
+    Rates a board as it starts.
+
+    Args:
+        board (Gameboard): The board.
+
+    Returns:
+        tuple: (balance, cluster, reachable, difficulty):
+            - balance: Effective number of styles (the exponential of the entropy of the style counts)
+              over the number of styles on the board, 1 when every style has as many bubbles.
+            - cluster: Mean number of bubbles of the groups of touching bubbles of the same style.
+            - reachable: Share of the bubbles a shot from the shooter can hit directly.
+            - difficulty: Grows with smaller groups and fewer reachable bubbles.
+    """
+    counts = Counter(style for style in board.grid if style)
+    bubbles = sum(counts.values())
+    if not bubbles:
+        return 0.0, 0.0, 0.0, 0.0
+    entropy = -sum(count / bubbles * math.log(count / bubbles) for count in counts.values())
+    balance = math.exp(entropy) / len(counts)
+
+    # Groups of touching bubbles of the same style
+    seen, groups = set(), 0
+    for k, style in enumerate(board.grid):
+        if style and k not in seen:
+            cluster = board.find_cluster(*divmod(k, board.cols), *board.styles[style])
+            seen.update(board.index(i, j) for i, j in cluster)
+            groups += 1
+    cluster = bubbles / groups
+
+    shooter = Shooter()
+    hits = set()
+    for angle in AIM_ANGLES:
+        shooter.angle = angle
+        path = resolve_shot(board, shooter.position[0], shooter.position[1], *shooter.shoot())
+        if path.hit is not None:
+            hits.add(path.hit)
+    reachable = len(hits) / bubbles
+
+    difficulty = (1 - reachable) / cluster
+    return balance, cluster, reachable, difficulty
+
+
+def is_fair(rating):
+    """
+    Returns:
+        bool: True if a board of the given rating can be put in a pack.
+    """
+    balance, _, reachable, _ = rating
+    return balance >= MIN_BALANCE and reachable >= MIN_REACHABLE
+
+
+def rate_candidates(level, seeds):
+    """
+    Generates and rates candidate boards of a level, one per seed.
+
+    Args:
+        level (int): The level.
+        seeds (list): Seeds of the boards.
+
+    Returns:
+        list: (color names, cells, rating, seed) of every fair board.
+    """
+    boards = []
+    for seed in seeds:
+        board = Gameboard(level, random.Random(seed))
+        rating = rate(board)
+        if is_fair(rating):
+            boards.append((list(board.colorSet), board.grid.tobytes(), rating, seed))
+    return boards
+
+
+def curate(candidates, count):
+    """
+    Keeps the boards closest to the median difficulty of the candidates, so the boards of a level play alike.
+
+    Args:
+        candidates (list): Fair boards of a level, as returned by rate_candidates.
+        count (int): Number of boards to keep.
+
+    Returns:
+        list: The kept boards, easiest first.
+    """
+    if not candidates:
+        return []
+    median = statistics.median(board[2][3] for board in candidates)
+    kept = sorted(candidates, key=lambda board: (abs(board[2][3] - median), board[3]))[:count]
+    return sorted(kept, key=lambda board: board[2][3])
+
+
+def _init_worker(overrides):
+    """
+    Applies the settings of the generator in a process. Boards are always generated, never loaded from a pack.
+    """
+    config.reload(**overrides, level_pack='')
+
+
+def build(path, levels=10, per_level=100, candidates=4, seed=0, workers=None, overrides=None):
+    """
+    Generates a level pack: for every level, candidates * per_level boards are generated and rated
+    over a pool of processes, and the per_level fair boards closest to the median difficulty are kept.
+
+    Args:
+        path (str): Path of the pack to write.
+        levels (int): Number of levels, numbered from 1.
+        per_level (int): Number of boards kept per level.
+        candidates (int): Number of boards generated for every board kept.
+        seed (int): Seed of the first board; the boards' seeds count up from it across the levels.
+        workers (int): Number of worker processes, one per core if not given, 0 to generate in this process.
+        overrides (dict): Settings overriding the configuration while the pack is built, e.g. {'rows': 20};
+            the settings of the caller are left as they were.
+
+    Returns:
+        list: For every level, the kept boards as (color names, cells, rating, seed).
+    """
+    overrides = overrides or {}
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    tasks = []
+    for level in range(1, levels + 1):
+        first = seed + (level - 1) * per_level * candidates
+        seeds = range(first, first + per_level * candidates)
+        chunk = max(1, per_level * candidates // (8 * max(1, workers)))
+        tasks += [(level, list(seeds[n:n + chunk])) for n in range(0, len(seeds), chunk)]
+
+    found = {level: [] for level in range(1, levels + 1)}
+    saved = config.settings()
+    try:
+        # The settings of the generator are only applied while the boards are generated and laid out
+        _init_worker(overrides)
+        layout = config.settings()
+        if workers == 0:
+            for level, seeds in tasks:
+                found[level] += rate_candidates(level, seeds)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(overrides,)) as executor:
+                for (level, _), boards in zip(tasks, executor.map(rate_candidates, *zip(*tasks))):
+                    found[level] += boards
+    finally:
+        config.restore(saved)
+
+    kept = [curate(found[level], per_level) for level in range(1, levels + 1)]
+    write_pack(path, layout.board_rows, layout.board_columns, kept)
+    return kept
+
+
+def main(argv=None):
+    """
+    Generates a level pack and prints how many fair boards every level got.
+    """
+    parser = argparse.ArgumentParser(description="Generate a pack of rated Bubble Buster levels.")
+    parser.add_argument('pack', help="level pack file to write; set it as level-pack in the configuration to use it")
+    parser.add_argument('--levels', type=int, default=10, help="number of levels")
+    parser.add_argument('--per-level', type=int, default=100, help="boards kept per level")
+    parser.add_argument('--candidates', type=int, default=4, help="boards generated for every board kept")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first board")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, one per core by default")
+    parser.add_argument('--rows', type=int, default=None, help="rows of the boards, those of the settings by default")
+    parser.add_argument('--columns', type=int, default=None,
+                        help="columns of the boards, those of the settings by default")
+    args = parser.parse_args(argv)
+
+    overrides = {name: value for name, value in (('rows', args.rows), ('columns', args.columns)) if value}
+    kept = build(args.pack, args.levels, args.per_level, args.candidates, args.seed, args.workers, overrides)
+    for level, boards in enumerate(kept, start=1):
+        if not boards:
+            print(f"level {level}: no fair board")
+            continue
+        print(f"level {level}: {len(boards)} boards, difficulty {boards[0][2][3]:.3f} to {boards[-1][2][3]:.3f}, "
+              f"mean cluster {statistics.fmean(board[2][1] for board in boards):.2f}, "
+              f"mean reachable {statistics.fmean(board[2][2] for board in boards):.0%}")
+    pack = LevelPack(args.pack)
+    print(f"{args.pack}: {pack.rows} x {pack.cols}, {pack.levels} levels, {pack.boards} boards, "
+          f"id {pack.pack_id:016x}")
+    pack.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import hashlib
+import mmap
+import os
+import struct
+
+from config import settings
+from packing import cell_bits, pack_cells, unpack_cells
+from styles import BUBBLE_COLOR_NAMES, COLOR_INDEX, COLORS
+
+# A pack starts with a header: magic, format version, board rows and columns, number of levels,
+# number of boards and an identifier hashed from the content
+MAGIC = b'BBLP'
+VERSION = 1
+HEADER = struct.Struct('<4sBHHHIQ')
+# Then, for every level from 1, the index of its first board and its number of boards
+LEVEL = struct.Struct('<II')
+# Then the index of the boards: offset of the board's data, length of its packed cells, number of colors,
+# bits per cell, its rating (balance, mean cluster size, reachable share, difficulty) and its generation seed
+ENTRY = struct.Struct('<QIBBffffQ')
+# The data of a board is its palette colors (one byte each) followed by its packed cells
+
+
+class LevelPack:
+    """
+    A level pack mapped in memory. Finding a board is a lookup in the level table and the index;
+    only the cells of the board asked for are unpacked.
+    Attributes:
+        - path: Path of the pack.
+        - rows, cols: Dimensions of the boards.
+        - levels: Number of levels, numbered from 1.
+        - pack_id: Identifier of the content of the pack.
+    """
+    def __init__(self, path):
+        """
+        Maps a pack.
+
+        Args:
+            path (str): Path of the pack.
+
+        Raises:
+            ValueError: If the file is not a level pack of a known version.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mapped)
+        if len(self.view) < HEADER.size:
+            raise ValueError(f"{path} is not a Bubble Buster level pack")
+        magic, version, self.rows, self.cols, self.levels, self.boards, self.pack_id = HEADER.unpack_from(self.view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Bubble Buster level pack")
+        if version != VERSION:
+            raise ValueError(f"{path} is a level pack of version {version}, expected {VERSION}")
+        self.index_offset = HEADER.size + self.levels * LEVEL.size
+
+    def count(self, level):
+        """
+        Returns:
+            int: Number of boards of a level, 0 if the pack does not hold the level.
+        """
+        if not 1 <= level <= self.levels:
+            return 0
+        return LEVEL.unpack_from(self.view, HEADER.size + (level - 1) * LEVEL.size)[1]
+
+    def entry(self, level, n):
+        """
+        Returns the index entry of a board: (offset, packed length, colors, bits, balance, cluster, reachable,
+        difficulty, seed).
+
+        Args:
+            level (int): The level.
+            n (int): Index of the board among the boards of the level.
+        """
+        first, count = LEVEL.unpack_from(self.view, HEADER.size + (level - 1) * LEVEL.size)
+        if not 0 <= n < count:
+            raise IndexError(f"Level {level} has {count} boards")
+        return ENTRY.unpack_from(self.view, self.index_offset + (first + n) * ENTRY.size)
+
+    def board(self, level, n):
+        """
+        Reads a board of a level.
+
+        Args:
+            level (int): The level.
+            n (int): Index of the board among the boards of the level.
+
+        Returns:
+            tuple: The color set of the board, and the style index of every cell.
+        """
+        offset, length, color_count, bits = self.entry(level, n)[:4]
+        names = [BUBBLE_COLOR_NAMES[k] for k in self.view[offset:offset + color_count]]
+        cells = self.view[offset + color_count:offset + color_count + length].tobytes()
+        return {name: COLORS[name] for name in names}, unpack_cells(cells, bits, self.rows * self.cols)
+
+    def pick(self, level, rng):
+        """
+        Draws one of the boards of a level.
+
+        Args:
+            level (int): The level, which the pack must hold.
+            rng (random.Random): The random generator to draw from.
+
+        Returns:
+            tuple: The color set of the board, and the style index of every cell.
+        """
+        return self.board(level, rng.randrange(self.count(level)))
+
+    def close(self):
+        """
+        Unmaps the pack.
+        """
+        self.view.release()
+        self.mapped.close()
+
+
+def write_pack(path, rows, cols, levels):
+    """
+    Writes a level pack. The file is replaced at once.
+
+    Args:
+        path (str): Path of the pack.
+        rows (int): Number of rows of the boards.
+        cols (int): Number of columns of the boards.
+        levels (list): For every level from 1, the list of its boards as (color names, cells, rating, seed),
+            the rating being (balance, cluster, reachable, difficulty).
+
+    Returns:
+        int: The identifier of the pack.
+    """
+    boards = [board for level in levels for board in level]
+    data_offset = HEADER.size + len(levels) * LEVEL.size + len(boards) * ENTRY.size
+
+    level_table, index, data = [], [], []
+    first = 0
+    for level in levels:
+        level_table.append(LEVEL.pack(first, len(level)))
+        first += len(level)
+    offset = data_offset
+    for names, cells, rating, seed in boards:
+        bits = cell_bits(max(cells, default=0) + 1)
+        packed = pack_cells(cells, bits)
+        index.append(ENTRY.pack(offset, len(packed), len(names), bits, *rating, seed))
+        data.append(bytes(COLOR_INDEX[name] for name in names) + packed)
+        offset += len(names) + len(packed)
+
+    body = b''.join(level_table + index + data)
+    pack_id = int.from_bytes(hashlib.blake2b(body, digest_size=8).digest(), 'little')
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, rows, cols, len(levels), len(boards), pack_id))
+        file.write(body)
+    os.replace(temporary, path)
+    return pack_id
+
+
+# Packs already mapped, keyed by path
+_packs = {}
+
+
+def active_pack():
+    """
+    Returns the level pack named by the settings, mapped the first time it is asked for.
+
+    Returns:
+        LevelPack or None: The pack, None if no pack is set.
+
+    Raises:
+        ValueError: If the boards of the pack do not have the dimensions of the settings.
+    """
+    config = settings()
+    if not config.level_pack:
+        return None
+    pack = _packs.get(config.level_pack)
+    if pack is None:
+        pack = _packs[config.level_pack] = LevelPack(config.level_pack)
+    if (pack.rows, pack.cols) != (config.board_rows, config.board_columns):
+        raise ValueError(f"Level pack {pack.path} holds {pack.rows} x {pack.cols} boards, "
+                         f"the settings give {config.board_rows} x {config.board_columns}")
+    return pack
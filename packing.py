@@ -0,0 +1,56 @@
+from array import array
+
+# Smallest number of bits a cell is packed in, for the number of styles the board uses
+PACKINGS = (1, 2, 4, 8)
+# Byte translation tables: PACK[bits][p] moves a style to the p-th slot of a packed byte,
+# UNPACK[bits][p] reads the style of the p-th slot back
+PACK = {bits: [bytes((value << (p * bits)) & 0xFF for value in range(256)) for p in range(8 // bits)]
+        for bits in PACKINGS}
+UNPACK = {bits: [bytes((value >> (p * bits)) & ((1 << bits) - 1) for value in range(256)) for p in range(8 // bits)]
+          for bits in PACKINGS}
+
+
+def cell_bits(count):
+    """
+    Returns the number of bits a cell is packed in for a board with the given number of styles.
+    """
+    return next(bits for bits in PACKINGS if count <= 1 << bits)
+
+
+def pack_cells(grid, bits):
+    """
+    Packs the style indices of the cells, 8 // bits cells per byte, the first one in the low bits.
+    Every slot is filled with one byte translation and the slots are merged as integers.
+
+    Args:
+        grid (bytes-like): Style index of every cell, each below 2 ** bits.
+        bits (int): Bits per cell, one of PACKINGS.
+
+    Returns:
+        bytes: The packed cells.
+    """
+    per_byte = 8 // bits
+    cells = bytes(grid) + bytes(-len(grid) % per_byte)
+    packed = 0
+    for p, table in enumerate(PACK[bits]):
+        packed |= int.from_bytes(cells[p::per_byte].translate(table), 'little')
+    return packed.to_bytes(len(cells) // per_byte, 'little')
+
+
+def unpack_cells(data, bits, count):
+    """
+    Unpacks cells packed by pack_cells.
+
+    Args:
+        data (bytes): The packed cells.
+        bits (int): Bits per cell.
+        count (int): Number of cells.
+
+    Returns:
+        array.array: The style index of every cell.
+    """
+    per_byte = 8 // bits
+    cells = bytearray(len(data) * per_byte)
+    for p, table in enumerate(UNPACK[bits]):
+        cells[p::per_byte] = data.translate(table)
+    return array('B', cells[:count])
@@ -0,0 +1,153 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+from config import settings
+
+# Phases of a frame of the main loop, in the order they run
+PHASES = ('events', 'shot', 'board', 'background', 'shooter', 'hud', 'flip', 'idle')
+
+
+class FrameProfiler:
+    """
+    Times the phases of every frame of the main loop, keeps the last frames for an on-screen overlay
+    with rolling percentiles, and optionally the whole trace to write it to disk.
+
+    Attributes:
+        frames (collections.deque): Phase durations in seconds of the last frames, one dict per frame.
+        trace (list or None): Phase durations of every frame since the start, None if not kept.
+        visible (bool): True while the overlay is shown.
+        refresh (int): Number of frames between two updates of the overlay text.
+    """
+    def __init__(self, window=240, keep_trace=False, refresh=15):
+        """
+        Args:
+            window (int): Number of frames the percentiles are computed over.
+            keep_trace (bool): Keep every frame so the trace can be exported.
+            refresh (int): Number of frames between two updates of the overlay text.
+        """
+        self.frames = deque(maxlen=window)
+        self.trace = [] if keep_trace else None
+        self.visible = False
+        self.refresh = refresh
+        self.current = None
+        self.last = 0
+        self.font = None
+        self.panel = None
+        self.count = 0
+
+    def start_frame(self):
+        """
+        Starts timing a new frame.
+        """
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        Ends a phase: the time elapsed since the last mark is added to it.
+
+        Args:
+            phase (str): One of PHASES.
+        """
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        """
+        Records the frame being timed.
+        """
+        self.frames.append(self.current)
+        if self.trace is not None:
+            self.trace.append(self.current)
+        self.count += 1
+
+    def toggle(self):
+        """
+        Shows or hides the overlay.
+        """
+        self.visible = not self.visible
+        self.panel = None
+
+    def percentiles(self, phase, quantiles=(0.5, 0.95, 0.99)):
+        """
+        Returns percentiles of a phase's duration over the last frames.
+
+        Args:
+            phase (str): One of PHASES, or 'total' for the whole frame.
+            quantiles (tuple): The quantiles to return, between 0 and 1.
+
+        Returns:
+            list: The durations at the given quantiles, in seconds.
+        """
+        if phase == 'total':
+            values = sorted(sum(frame.values()) for frame in self.frames)
+        else:
+            values = sorted(frame[phase] for frame in self.frames)
+        if not values:
+            return [0.0] * len(quantiles)
+        return [values[min(len(values) - 1, int(q * len(values)))] for q in quantiles]
+
+    def draw(self, window):
+        """
+        Draws the overlay in the top right corner of the window if it is visible.
+        The text is only rendered again every few frames.
+
+        Args:
+            window (pygame.Surface): The game window.
+
+        Returns:
+            pygame.Rect or None: The area of the window that was drawn.
+        """
+        if not self.visible:
+            return None
+        if self.panel is None or self.count % self.refresh == 0:
+            self.panel = self.render_panel()
+        return window.blit(self.panel, (settings().window_width - self.panel.get_width() - 5, 5))
+
+    def render_panel(self):
+        """
+        Renders the percentiles of every phase, in milliseconds, on a translucent panel.
+        """
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        rows = [("phase", "p50", "p95", "p99")]
+        for phase in PHASES + ('total',):
+            rows.append((phase, *(f"{value * 1000:.2f}" for value in self.percentiles(phase))))
+        cells = [[self.font.render(text, True, (255, 255, 255)) for text in row] for row in rows]
+
+        # Names are aligned left, numbers right
+        widths = [max(row[column].get_width() for row in cells) + 8 for column in range(len(rows[0]))]
+        line_height = self.font.get_linesize()
+        panel = pygame.Surface((sum(widths) + 4, line_height * len(rows) + 10), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for n, row in enumerate(cells):
+            x = 5
+            for column, text in enumerate(row):
+                offset = 0 if column == 0 else widths[column] - 8 - text.get_width()
+                panel.blit(text, (x + offset, 5 + n * line_height))
+                x += widths[column]
+        return panel
+
+    def export(self, path):
+        """
+        Writes the trace to a CSV or JSON file, chosen by the extension of the path.
+        Durations are in milliseconds, one row per frame.
+
+        Args:
+            path (str): Path of the file.
+        """
+        frames = self.trace if self.trace is not None else list(self.frames)
+        rows = [{'frame': n, **{phase: frame[phase] * 1000 for phase in PHASES},
+                 'total': sum(frame.values()) * 1000} for n, frame in enumerate(frames)]
+        with open(path, 'w', newline='') as file:
+            if path.endswith('.json'):
+                json.dump(rows, file, indent=1)
+            else:
+                writer = csv.DictWriter(file, fieldnames=['frame', *PHASES, 'total'])
+                writer.writeheader()
+                writer.writerows(rows)
@@ -0,0 +1,193 @@
+import math
+
+import pygame
+
+from styles import draw_background
+
+# Pre-rendered bubbles, keyed by (fill, outline, radius, outline width)
+_bubble_sprites = {}
+# Translucent copies of the bubble sprites, keyed like the sprites plus their opacity
+_ghost_sprites = {}
+
+
+def bubble_sprite(fillcolor, outline, radius, outline_width):
+    """
+    Get the pre-rendered surface of a bubble style, rendering it the first time it is asked for.
+    The bubble is centered on the surface, which is 2 * ceil(radius) + 1 pixels wide.
+
+    Args:
+        fillcolor (str or tuple): Color used to fill the bubble.
+        outline (str or tuple): Color of the bubble's outline.
+        radius (float): Radius of the bubble.
+        outline_width (int): Thickness of the bubble's outline.
+
+    Returns:
+        pygame.Surface: The bubble on a transparent surface.
+    """
+    key = (fillcolor, outline, radius, outline_width)
+    sprite = _bubble_sprites.get(key)
+    if sprite is None:
+        half = math.ceil(radius)
+        sprite = pygame.Surface((2 * half + 1, 2 * half + 1), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, outline, (half, half), radius)  # Draw outline
+        pygame.draw.circle(sprite, fillcolor, (half, half), radius - outline_width)  # Draw fill
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        _bubble_sprites[key] = sprite
+    return sprite
+
+
+def ghost_sprite(fillcolor, outline, radius, outline_width, alpha=110):
+    """
+    Get a translucent copy of a bubble sprite, used to show where a shot will land.
+
+    Args:
+        fillcolor (str or tuple): Color used to fill the bubble.
+        outline (str or tuple): Color of the bubble's outline.
+        radius (float): Radius of the bubble.
+        outline_width (int): Thickness of the bubble's outline.
+        alpha (int): Opacity of the copy, from 0 to 255.
+
+    Returns:
+        pygame.Surface: The translucent bubble.
+    """
+    key = (fillcolor, outline, radius, outline_width, alpha)
+    sprite = _ghost_sprites.get(key)
+    if sprite is None:
+        sprite = bubble_sprite(fillcolor, outline, radius, outline_width).copy()
+        sprite.set_alpha(alpha)
+        _ghost_sprites[key] = sprite
+    return sprite
+
+
+def sprite_topleft(x, y, radius):
+    """
+    Get the position where the sprite of a bubble centered on (x, y) is blitted.
+    """
+    half = math.ceil(radius)
+    return round(x) - half, round(y) - half
+
+
+class BoardRenderer:
+    """
+    Renders the game by dirty rectangles: the background and the settled gameboard are kept on an
+    off-screen layer, where only the cells changed by a shot or a row push are repainted, and only the
+    changed areas of the window are sent to the display. The heads-up display is kept on the layer too,
+    above the board, and only drawn again when what it shows changes.
+
+    Attributes:
+        window (pygame.Surface): The game window.
+        layer (pygame.Surface): Off-screen copy of the background and the settled board.
+        background (pygame.Surface): The background alone, used to erase cells.
+        board (Gameboard): The board currently on the layer.
+        full_redraw (bool): True if the whole layer and window must be repainted.
+        changed_rects (list): Areas of the window changed since the last frame was presented.
+        overlay_rects (list): Areas covered by the moving elements of the last frame.
+        hud_key: What the heads-up display on the layer shows, None if it must be drawn again.
+        hud_rects (list): Areas of the layer covered by the heads-up display.
+    """
+    def __init__(self, window):
+        """
+        Create the off-screen layers for a window.
+
+        Args:
+            window (pygame.Surface): The game window.
+        """
+        self.window = window
+        self.layer = pygame.Surface(window.get_size()).convert()
+        self.background = pygame.Surface(window.get_size()).convert()
+        draw_background(self.background)
+        self.board = None
+        self.full_redraw = True
+        self.changed_rects = []
+        self.overlay_rects = []
+        self.hud_key = None
+        self.hud_rects = []
+
+    def invalidate(self):
+        """
+        Repaint everything on the next frame, e.g. after another screen was shown in the window.
+        """
+        self.full_redraw = True
+
+    def update_board(self, board):
+        """
+        Bring the layer up to date with the board and copy the changed areas to the window.
+
+        Args:
+            board (Gameboard): The board to render.
+        """
+        if board is not self.board or board.redraw_all:
+            self.board = board
+            self.full_redraw = True
+
+        if self.full_redraw:
+            self.layer.blit(self.background, (0, 0))
+            board.draw(self.layer)
+            self.window.blit(self.layer, (0, 0))
+            self.changed_rects = [self.window.get_rect()]
+            self.overlay_rects = []
+            self.hud_key = None
+            self.hud_rects = []
+            self.full_redraw = False
+        else:
+            for k in board.dirty:
+                # Erase the cell and paint it again along with the neighbors overlapping its area
+                rect = board.cell_rect(k).inflate(2, 2)
+                self.layer.set_clip(rect)
+                self.layer.blit(self.background, rect, rect)
+                i, j = divmod(k, board.cols)
+                for cell in [k] + [board.index(ni, nj) for ni, nj in board.get_neighbors(i, j)]:
+                    if board.grid[cell]:
+                        board.draw_cell(self.layer, cell)
+                self.layer.set_clip(None)
+                self.window.blit(self.layer, rect, rect)
+                self.changed_rects.append(rect)
+                if rect.collidelist(self.hud_rects) != -1:
+                    self.hud_key = None  # The cell was painted over the heads-up display
+
+        board.dirty.clear()
+        board.redraw_all = False
+
+    def update_hud(self, key, draw, *args):
+        """
+        Draw the heads-up display again on the layer if what it shows changed, and copy it to the window.
+
+        Args:
+            key: What the display shows, e.g. the score and the next bubbles, compared with the last one.
+            draw (callable): Draws the display on the surface given as its first argument, followed by args,
+                and returns the areas it drew.
+        """
+        if self.hud_key is not None and key == self.hud_key:
+            return
+        # Erase the last display, down to the background and the board under it
+        for rect in self.hud_rects:
+            self.layer.set_clip(rect)
+            self.layer.blit(self.background, rect, rect)
+            self.board.draw(self.layer)
+        self.layer.set_clip(None)
+        rects = self.hud_rects + [rect for rect in draw(self.layer, *args) if rect]
+        for rect in rects:
+            self.window.blit(self.layer, rect, rect)
+        self.changed_rects += rects
+        self.hud_rects = rects[len(self.hud_rects):]
+        self.hud_key = key
+
+    def restore(self):
+        """
+        Erase the moving elements drawn during the last frame.
+        """
+        for rect in self.overlay_rects:
+            self.window.blit(self.layer, rect, rect)
+
+    def present(self, overlay_rects):
+        """
+        Send the changed areas of the window to the display.
+
+        Args:
+            overlay_rects (list): Areas covered by the moving elements drawn during this frame.
+        """
+        overlay_rects = [rect for rect in overlay_rects if rect]
+        pygame.display.update(self.changed_rects + self.overlay_rects + overlay_rects)
+        self.changed_rects = []
+        self.overlay_rects = overlay_rects
@@ -0,0 +1,304 @@
+import argparse
+import os
+import struct
+import sys
+import time
+
+import config
+from config import settings
+from engine import GameEngine
+from levelpack import active_pack
+from styles import BUBBLE_COLOR_NAMES, COLOR_INDEX
+
+# A log starts with a header: magic, format version, seed and starting level of the game,
+# the settings shaping the board, the trajectories and the shooter's queue, then the identifier of the level pack
+# (0 for none). Version 3 records the queue settings, and replays the palettes and queues drawn since version 2.
+MAGIC = b'BBRL'
+VERSION = 3
+HEADER = struct.Struct('<4sBQHHHHHHHHHHHdQ')
+# Settings recorded in the header, in order, and the overrides restoring them. The margins and the window size
+# give the bubble radius and the position of every cell, hence the trajectories.
+RECORDED_SETTINGS = ('board_rows', 'board_columns', 'window_width', 'window_height', 'margin_left', 'margin_right',
+                     'margin_top', 'margin_bottom', 'push_interval', 'preview_bubbles', 'queue_bias')
+SETTING_OVERRIDES = ('rows', 'columns', 'window_width', 'window_height', 'margin_left', 'margin_right',
+                     'margin_top', 'margin_bottom', 'push_interval', 'preview_bubbles', 'queue_bias')
+
+# Records following the header, each starting with its tag
+LEVEL = struct.Struct('<cHB')  # Level started: level, number of colors, then one byte per color of the palette
+SHOT = struct.Struct('<cId')  # Shot fired: frame index, shooter angle in degrees
+END = struct.Struct('<cIIHB')  # Game ended: frame index, score, level reached, index of the cause in CAUSES
+CAUSES = ('quit', 'last-row-hit', 'board-full')
+
+
+class Recorder:
+    """
+    Writes the log of a game as it is played. Every record is flushed at once, so the log of a game
+    that crashed holds everything up to the crash.
+    Attributes:
+        - path: Path of the log.
+        - game: The GameEngine being recorded.
+        - file: The open log, None once the game ended.
+    """
+    def __init__(self, path, game):
+        """
+        Creates the log and records the header and the first level.
+
+        Args:
+            path (str): Path of the log.
+            game (GameEngine): The game to record, as it starts.
+        """
+        self.path = path
+        self.game = game
+        self.file = open(path, 'wb')
+        current = settings()
+        self.file.write(HEADER.pack(MAGIC, VERSION, game.seed, game.level,
+                                    *(getattr(current, name) for name in RECORDED_SETTINGS), pack_id()))
+        self.level()
+
+    def _write(self, data):
+        if self.file is not None:
+            self.file.write(data)
+            self.file.flush()
+
+    def level(self):
+        """
+        Records the start of the game's current level, with its palette.
+        """
+        names = list(self.game.board.colorSet)
+        self._write(LEVEL.pack(b'L', self.game.level, len(names)) + bytes(COLOR_INDEX[name] for name in names))
+
+    def shot(self, frame, angle):
+        """
+        Records a shot.
+
+        Args:
+            frame (int): Index of the frame the shot was fired in.
+            angle (float): Shooter angle in degrees.
+        """
+        self._write(SHOT.pack(b'S', frame, angle))
+
+    def end(self, frame):
+        """
+        Records the end of the game and closes the log. Does nothing if it was already closed.
+
+        Args:
+            frame (int): Index of the last frame of the game.
+        """
+        if self.file is None:
+            return
+        game = self.game
+        self._write(END.pack(b'E', frame, game.score.score, game.level, CAUSES.index(game.game_over or 'quit')))
+        self.file.close()
+        self.file = None
+
+
+def pack_id():
+    """
+    Returns:
+        int: The identifier of the level pack the boards are loaded from, 0 if they are generated.
+    """
+    pack = active_pack()
+    return pack.pack_id if pack is not None else 0
+
+
+def recorder_in(directory):
+    """
+    Returns a function starting the log of every new game in a directory, named after the time and the seed.
+
+    Args:
+        directory (str): Where the logs are written, created if needed.
+
+    Returns:
+        callable: Takes a GameEngine and returns its Recorder.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    def record(game):
+        return Recorder(os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{game.seed}.bbr"), game)
+    return record
+
+
+class Replay:
+    """
+    A game log read back.
+    Attributes:
+        - seed: Seed of the game.
+        - level: Starting level.
+        - settings: The recorded settings, as overrides for config.reload.
+        - pack_id: Identifier of the level pack the boards were loaded from, 0 if they were generated.
+        - levels: (level, color names) of every level started, in order.
+        - shots: (frame, angle) of every shot, in order.
+        - end: (frame, score, level, cause) of the end of the game, None if the log was cut short.
+    """
+    def __init__(self, seed, level, settings, pack_id=0):
+        self.seed = seed
+        self.level = level
+        self.settings = settings
+        self.pack_id = pack_id
+        self.levels = []
+        self.shots = []
+        self.end = None
+
+
+def load(path):
+    """
+    Reads a game log. A record cut short, as left by a crash, ends the log.
+
+    Args:
+        path (str): Path of the log.
+
+    Returns:
+        Replay: The recorded game.
+
+    Raises:
+        ValueError: If the file is not a game log of a known version.
+    """
+    with open(path, 'rb') as file:
+        data = memoryview(file.read())
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a Bubble Buster game log")
+    magic, version, seed, level, *values, recorded_pack = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a Bubble Buster game log")
+    if version != VERSION:
+        raise ValueError(f"{path} is a game log of version {version}, expected {VERSION}")
+    replay = Replay(seed, level, dict(zip(SETTING_OVERRIDES, values)), recorded_pack)
+
+    offset = HEADER.size
+    while offset < len(data):
+        tag = data[offset:offset + 1].tobytes()
+        if tag == b'S' and offset + SHOT.size <= len(data):
+            _, frame, angle = SHOT.unpack_from(data, offset)
+            replay.shots.append((frame, angle))
+            offset += SHOT.size
+        elif tag == b'L' and offset + LEVEL.size <= len(data):
+            _, number, count = LEVEL.unpack_from(data, offset)
+            colors = data[offset + LEVEL.size:offset + LEVEL.size + count]
+            if len(colors) < count:
+                break
+            replay.levels.append((number, [BUBBLE_COLOR_NAMES[n] for n in colors]))
+            offset += LEVEL.size + count
+        elif tag == b'E' and offset + END.size <= len(data):
+            _, frame, score, number, cause = END.unpack_from(data, offset)
+            replay.end = (frame, score, number, CAUSES[cause])
+            offset += END.size
+        elif tag in (b'S', b'L', b'E'):
+            break  # Cut short
+        else:
+            raise ValueError(f"{path}: unknown record {tag!r} at byte {offset}")
+    return replay
+
+
+def configure(replay):
+    """
+    Loads the settings the game was recorded with.
+
+    Returns:
+        Settings: The new settings.
+    """
+    return config.reload(**replay.settings)
+
+
+def play(replay):
+    """
+    Plays the recorded shots headlessly, as fast as they can be simulated, with the current settings.
+
+    Args:
+        replay (Replay): The recorded game.
+
+    Returns:
+        tuple: The GameEngine as it ended, and the (level, color names) of every level it started.
+    """
+    game = GameEngine(replay.seed, replay.level)
+    levels = [(game.level, list(game.board.colorSet))]
+    for _, angle in replay.shots:
+        if game.game_over is not None:
+            break
+        if game.shoot(angle).level_complete:
+            levels.append((game.level, list(game.board.colorSet)))
+    return game, levels
+
+
+def check(replay):
+    """
+    Replays a game headlessly with its recorded settings and compares it with the log.
+
+    Args:
+        replay (Replay): The recorded game.
+
+    Returns:
+        list: Descriptions of the differences, empty if the game played out as recorded.
+    """
+    configure(replay)
+    if replay.pack_id != pack_id():
+        return [f"recorded with level pack {replay.pack_id:016x}, the settings give {pack_id():016x}"]
+    game, levels = play(replay)
+    problems = []
+    for recorded, replayed in zip(replay.levels, levels):
+        if recorded != replayed:
+            problems.append(f"level {recorded[0]} palette {recorded[1]}, replayed level {replayed[0]} {replayed[1]}")
+            break
+    if len(levels) < len(replay.levels):
+        problems.append(f"{len(replay.levels)} levels recorded, {len(levels)} replayed")
+    if replay.end is not None:
+        _, score, level, cause = replay.end
+        replayed = (game.score.score, game.level, game.game_over or 'quit')
+        if (score, level, cause) != replayed:
+            problems.append(f"ended with score {score}, level {level}, {cause}; "
+                            f"replayed score {replayed[0]}, level {replayed[1]}, {replayed[2]}")
+    return problems
+
+
+def render(replay):
+    """
+    Plays a recorded game in a window at the game's frame rate, every shot fired at its recorded frame.
+
+    Args:
+        replay (Replay): The recorded game.
+    """
+    import pygame
+    import draw
+    from effects import initialize_window
+
+    current = configure(replay)
+    window, clock = initialize_window(current.window_width, current.window_height, "Bubble Buster replay")
+    draw.run(window, clock, GameEngine(replay.seed, replay.level), shots=replay.shots)
+    pygame.quit()
+
+
+def main(argv=None):
+    """
+    Checks game logs headlessly, or plays one in a window.
+
+    Returns:
+        int: 1 if a log did not replay as recorded, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Replay recorded Bubble Buster games.")
+    parser.add_argument('logs', nargs='+', help="game logs, or directories of game logs")
+    parser.add_argument('--render', action='store_true', help="play the first log in a window, in real time")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.logs:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.bbr'))
+        else:
+            paths.append(path)
+    try:
+        if args.render:
+            render(load(paths[0]))
+            return 0
+
+        failed = 0
+        for path in paths:
+            problems = check(load(path))
+            failed += bool(problems)
+            print(f"{path}: {'; '.join(problems) if problems else 'ok'}")
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{len(paths) - failed} of {len(paths)} games replayed as recorded")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,44 @@
 import pygame
 
 # Import custom modules for styles and drawing utilities
-from styles import getProp, colors, draw_background
+from config import settings
+from styles import colors, draw_background
+from render import bubble_sprite, ghost_sprite, sprite_topleft
+
+# Rendered texts of the heads-up display, keyed by (text, font size, color)
+_labels = {}
+
+# Events after which a static screen is drawn again, as the window lost its content
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
+
+def wait_for_input(clock, draw, answer):
+    """
+    Shows a static screen until the player answers it. The screen is drawn once, then the loop sleeps
+    in pygame.event.wait and only draws it again when the window needs it, instead of redrawing every frame.
+
+    Args:
+        clock (pygame.time.Clock): The clock of the game loop, reset on leaving so the time spent
+            on the screen does not count as a frame.
+        draw (callable): Draws the screen on the window.
+        answer (callable): Takes an event, returns a true value if it closes the screen.
+
+    Returns:
+        The value returned by answer for the event that closed the screen.
+    """
+    draw()
+    pygame.display.flip()  # Update the screen
+    while True:
+        event = pygame.event.wait()  # Sleep until the next event
+        if event.type == pygame.QUIT:  # Exit if the window is closed
+            pygame.quit()
+            exit()
+        result = answer(event)
+        if result:
+            clock.tick()
+            return result
+        if event.type in REDRAW_EVENTS:
+            draw()
+            pygame.display.flip()
 
 def beginning_screen(window, clock):
     """
@@ -13,28 +50,19 @@ def beginning_screen(window, clock):
 
     # Define the position and size of the "Play Game" button
     button_rect = pygame.Rect(
-        getProp('window-width') // 2 - 100,  # Centered horizontally
-        getProp('window-height') // 2,  # Vertically placed in the middle
+        settings().window_width // 2 - 100,  # Centered horizontally
+        settings().window_height // 2,  # Vertically placed in the middle
         200,  # Button width
         50  # Button height
     )
 
-    running = True
-    while running:
-        for event in pygame.event.get():  # Process events
-            if event.type == pygame.QUIT:  # Exit if the window is closed
-                pygame.quit()
-                exit()
-            elif event.type == pygame.MOUSEBUTTONDOWN and button_rect.collidepoint(event.pos):
-                # Start the game if the button is clicked
-                running = False
-
+    def draw():
         draw_background(window)  # Draw the background on the window
 
         # Draw the title text at the top
         window.blit(
             title_text,
-            (getProp('window-width') // 2 - title_text.get_width() // 2, getProp('window-height') // 2 - 100)
+            (settings().window_width // 2 - title_text.get_width() // 2, settings().window_height // 2 - 100)
         )
 
         # Draw the button and its text
@@ -44,8 +72,9 @@ def beginning_screen(window, clock):
             (button_rect.x + button_rect.width // 2 - button_text.get_width() // 2, button_rect.y + 10)
         )
 
-        pygame.display.flip()  # Update the screen
-        clock.tick(getProp('FPS'))  # Limit frame rate
+    # Start the game when the button is clicked
+    wait_for_input(clock, draw,
+                   lambda event: event.type == pygame.MOUSEBUTTONDOWN and button_rect.collidepoint(event.pos))
 
 def show_instructions(window, clock):
     """
@@ -60,16 +89,7 @@ def show_instructions(window, clock):
         "THE SAME COLOR."
     ]  # Instruction lines to display
 
-    running = True
-    while running:
-        for event in pygame.event.get():  # Process events
-            if event.type == pygame.QUIT:  # Exit if the window is closed
-                pygame.quit()
-                exit()
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
-                # Start the game when the ENTER key is pressed
-                running = False
-
+    def draw():
         draw_background(window)  # Draw the background
 
         # Display each line of instructions on the screen
@@ -77,18 +97,18 @@ def show_instructions(window, clock):
             text_surface = font.render(line, True, colors()['brown'])
             window.blit(
                 text_surface,
-                (getProp('window-width') // 2 - text_surface.get_width() // 2, 150 + i * 40)
+                (settings().window_width // 2 - text_surface.get_width() // 2, 150 + i * 40)
             )
 
         # Display the "Press ENTER to start" message
         instruction_text = font.render("Press ENTER to start", True, colors()['brown'])
         window.blit(
             instruction_text,
-            (getProp('window-width') // 2 - instruction_text.get_width() // 2, 500)
+            (settings().window_width // 2 - instruction_text.get_width() // 2, 500)
         )
 
-        pygame.display.flip()  # Update the screen
-        clock.tick(getProp('FPS'))  # Limit frame rate
+    # Start the game when the ENTER key is pressed
+    wait_for_input(clock, draw, lambda event: event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN)
 
 def level_complete_screen(window, clock):
     """
@@ -98,52 +118,90 @@ def level_complete_screen(window, clock):
     message_text = font.render("Level Complete!", True, colors()['brown'])  # Render the level complete message
     instruction_text = font.render("Press ENTER to continue", True, colors()['brown'])  # Render instructions
 
-    running = True
-    while running:
-        for event in pygame.event.get():  # Process events
-            if event.type == pygame.QUIT:  # Exit if the window is closed
-                pygame.quit()
-                exit()
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
-                # Continue to the next level when the ENTER key is pressed
-                running = False
-
+    def draw():
         draw_background(window)  # Draw the background
 
         # Display the "Level Complete" message and instructions
         window.blit(
             message_text,
-            (getProp('window-width') // 2 - message_text.get_width() // 2, getProp('window-height') // 2 - 50)
+            (settings().window_width // 2 - message_text.get_width() // 2, settings().window_height // 2 - 50)
         )
         window.blit(
             instruction_text,
-            (getProp('window-width') // 2 - instruction_text.get_width() // 2, getProp('window-height') // 2 + 50)
+            (settings().window_width // 2 - instruction_text.get_width() // 2, settings().window_height // 2 + 50)
         )
 
-        pygame.display.flip()  # Update the screen
-        clock.tick(getProp('FPS'))  # Limit frame rate
+    # Continue to the next level when the ENTER key is pressed
+    wait_for_input(clock, draw, lambda event: event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN)
+
+def hud_label(text, size, color):
+    """
+    Get a text of the heads-up display, rendered with the default font the first time it is asked for.
+
+    Args:
+        text (str): The text.
+        size (int): Font size.
+        color (tuple): Color of the text.
 
-def draw_next_bubble(window, next_bubble):
+    Returns:
+        pygame.Surface: The rendered text.
     """
-    Draw the next bubble in the queue on the screen.
+    key = (text, size, color)
+    surface = _labels.get(key)
+    if surface is None:
+        surface = _labels[key] = pygame.font.Font(None, size).render(text, True, color)
+    return surface
+
+def draw_next_bubble(window, next_bubbles):
+    """
+    Draw the next bubbles in the queue on the screen, the next one first.
+
+    Args:
+        window (pygame.Surface): The game window.
+        next_bubbles (list): The bubbles to show.
+
+    Returns:
+        pygame.Rect: The area of the window that was drawn.
     """
     # Define the position of the next bubble display area
     bar_height = 80
-    bar_y = getProp('window-height') - bar_height
-    pygame.draw.rect(window, colors()['background'], (0, bar_y, getProp('window-width'), bar_height))  # Background bar
+    bar_y = settings().window_height - bar_height
+    bar_rect = pygame.draw.rect(window, colors()['background'], (0, bar_y, settings().window_width, bar_height))  # Background bar
 
     # Display "Next Bubble" text
-    text_font = pygame.font.Font(None, 36)
-    text_surface = text_font.render("Next Bubble:", True, colors()['white'])
+    text_surface = hud_label("Next Bubble:", 36, colors()['white'])
     text_x = 20
     text_y = bar_y + (bar_height // 2 - text_surface.get_height() // 2)
     window.blit(text_surface, (text_x, text_y))
 
-    # Draw the next bubble
+    # Draw the next bubbles side by side
     bubble_x = text_x + text_surface.get_width() + 50
     bubble_y = bar_y + bar_height // 2
-    pygame.draw.circle(window, next_bubble.outline, (bubble_x, bubble_y), next_bubble.radius)  # Outline
-    pygame.draw.circle(window, next_bubble.fillcolor, (bubble_x, bubble_y), next_bubble.radius - next_bubble.outline_width)  # Fill color
+    for next_bubble in next_bubbles:
+        sprite = bubble_sprite(next_bubble.fillcolor, next_bubble.outline, next_bubble.radius,
+                               next_bubble.outline_width)
+        window.blit(sprite, sprite_topleft(bubble_x, bubble_y, next_bubble.radius))
+        bubble_x += 3 * next_bubble.radius
+    return bar_rect
+
+def draw_landing_preview(window, board, cell, bubble):
+    """
+    Draw a translucent copy of the shooter's bubble in the cell where it will land.
+
+    Args:
+        window (pygame.Surface): The game window.
+        board (Gameboard): The gameboard.
+        cell (tuple): (row, column) of the landing cell, or None if the shot cannot land.
+        bubble (Bubble): The bubble in the shooter.
+
+    Returns:
+        pygame.Rect or None: The area of the window that was drawn.
+    """
+    if cell is None or bubble is None:
+        return None
+    k = board.index(*cell)
+    sprite = ghost_sprite(bubble.fillcolor, bubble.outline, board.radius, bubble.outline_width)
+    return window.blit(sprite, board.topleft[k])
 
 def game_over_screen(window, clock):
     """
@@ -151,26 +209,24 @@ def game_over_screen(window, clock):
     """
     font = pygame.font.Font(None, 74)  # Large font for the "Game Over" message
     text = font.render("Game Over", True, (255, 0, 0))  # Render in red
-    text_rect = text.get_rect(center=(getProp('window-width') // 2, getProp('window-height') // 3))
+    text_rect = text.get_rect(center=(settings().window_width // 2, settings().window_height // 3))
 
     restart_font = pygame.font.Font(None, 36)  # Smaller font for restart options
     restart_text = restart_font.render("Press R to Restart or Q to Quit", True, (255, 255, 255))
-    restart_rect = restart_text.get_rect(center=(getProp('window-width') // 2, getProp('window-height') // 2))
+    restart_rect = restart_text.get_rect(center=(settings().window_width // 2, settings().window_height // 2))
 
-    window.fill((0, 0, 0))  # Fill the screen with black
-    window.blit(text, text_rect)  # Display the "Game Over" message
-    window.blit(restart_text, restart_rect)  # Display the restart instructions
+    def draw():
+        window.fill((0, 0, 0))  # Fill the screen with black
+        window.blit(text, text_rect)  # Display the "Game Over" message
+        window.blit(restart_text, restart_rect)  # Display the restart instructions
 
-    pygame.display.flip()  # Update the screen
-
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:  # Exit the game if the window is closed
+    def answer(event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_q:  # Quit the game
                 pygame.quit()
                 exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_q:  # Quit the game
-                    pygame.quit()
-                    exit()
-                elif event.key == pygame.K_r:  # Restart the game
-                    return 'restart'
+            elif event.key == pygame.K_r:  # Restart the game
+                return 'restart'
+        return None
+
+    return wait_for_input(clock, draw, answer)
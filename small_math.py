@@ -1,6 +1,6 @@
 import math  # Import the math module for mathematical functions and calculations
 
-from styles import getGenProp  # Import a utility function to get general properties
+from config import settings  # Import the game settings
 
 
 def directions_for_pos(i):
@@ -26,7 +26,7 @@ def calculate_bubble_position(x, y):
     Returns:
         tuple: A tuple (xcoord, ycoord) representing the pixel coordinates of the bubble.
     """
-    bubradius = getGenProp('bubble-radius')  # Get the radius of the bubbles from a general property
+    bubradius = settings().bubble_radius  # Get the radius of the bubbles from the settings
     # Calculate the x-coordinate based on the column number, bubble radius, and row parity (for staggering rows)
     xcoord = bubradius + y * 2 * bubradius + (0 if x % 2 == 1 else bubradius)
     # Calculate the y-coordinate based on the row number and bubble radius
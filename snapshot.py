@@ -0,0 +1,132 @@
+import mmap
+import os
+import random
+import struct
+from array import array
+
+from engine import GameEngine
+from game_elements import Gameboard
+from packing import cell_bits, pack_cells, unpack_cells
+from styles import BUBBLE_COLOR_NAMES, COLOR_INDEX, COLORS
+
+# A snapshot starts with a header: magic, format version, seed, level, board rows and columns, score, shots fired
+# on the board, bits per packed cell, number of palette colors, of styles and of queued bubbles, and flags
+MAGIC = b'BBSN'
+VERSION = 1
+HEADER = struct.Struct('<4sBQHHHIIBBBHB')
+SETTLED = 1  # Flag: every bubble is attached to the top row
+GAUSS = 2  # Flag: the random generator holds a cached gaussian value
+# The header is followed by the palette colors (one byte each), the styles (two RGB colors each),
+# the random generator state, the style of the shooter's bubble, the queued styles and the packed cells
+STYLE = struct.Struct('<6B')
+RNG_WORDS = 625  # 32-bit words of the Mersenne Twister state, including its position
+GAUSS_NEXT = struct.Struct('<d')
+
+
+def capture(game):
+    """
+    Takes a snapshot of a game, as it stands between two shots.
+
+    Args:
+        game (GameEngine): The game.
+
+    Returns:
+        bytes: The snapshot.
+    """
+    board = game.board
+    bubble = game.shooter.bubble
+    shooter_style = board.style_index(bubble.fillcolor, bubble.outline)
+    queue = bytes(board.bubbles_queue)
+    bits = cell_bits(len(board.styles))
+    version, state, gauss_next = game.rng.getstate()
+    flags = (SETTLED if board.settled else 0) | (GAUSS if gauss_next is not None else 0)
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION, game.seed, game.level, board.rows, board.cols, game.score.score, game.shots,
+                    bits, len(board.colorSet), len(board.styles), len(queue), flags),
+        bytes(COLOR_INDEX[name] for name in board.colorSet),
+        b''.join(STYLE.pack(*fill, *outline) for fill, outline in board.styles),
+        array('I', state).tobytes(),
+        GAUSS_NEXT.pack(gauss_next or 0.0),
+        bytes((shooter_style,)),
+        queue,
+        pack_cells(board.grid, bits),
+    ]
+    return b''.join(parts)
+
+
+def restore(data):
+    """
+    Rebuilds a game from a snapshot. The sections are read in place from the buffer;
+    only the cells are unpacked, into the board's own grid.
+
+    Args:
+        data (bytes-like): The snapshot, e.g. a memoryview of a mapped file.
+
+    Returns:
+        GameEngine: The game, as it stood when the snapshot was taken.
+
+    Raises:
+        ValueError: If the data is not a snapshot of a known version, or of a board of another size.
+    """
+    view = memoryview(data)
+    if len(view) < HEADER.size or view[:4] != MAGIC:
+        raise ValueError("Not a Bubble Buster snapshot")
+    (_, version, seed, level, rows, cols, score, shots, bits, color_count, style_count, queue_count,
+     flags) = HEADER.unpack_from(view)
+    if version != VERSION:
+        raise ValueError(f"Snapshot of version {version}, expected {VERSION}")
+
+    offset = HEADER.size
+    colorset = {BUBBLE_COLOR_NAMES[n]: COLORS[BUBBLE_COLOR_NAMES[n]] for n in view[offset:offset + color_count]}
+    offset += color_count
+    board_styles = [(tuple(values[:3]), tuple(values[3:])) for values in STYLE.iter_unpack(
+        view[offset:offset + style_count * STYLE.size])]
+    offset += style_count * STYLE.size
+    state = array('I')
+    state.frombytes(view[offset:offset + RNG_WORDS * state.itemsize])
+    offset += RNG_WORDS * state.itemsize
+    gauss_next = GAUSS_NEXT.unpack_from(view, offset)[0] if flags & GAUSS else None
+    offset += GAUSS_NEXT.size
+    shooter_style = view[offset]
+    offset += 1
+    queue = view[offset:offset + queue_count]
+    offset += queue_count
+    grid = unpack_cells(view[offset:].tobytes(), bits, rows * cols)
+
+    rng = random.Random()
+    rng.setstate((3, tuple(state), gauss_next))
+    board = Gameboard.restore(level, rng, colorset, board_styles, grid, queue, bool(flags & SETTLED))
+    if (board.rows, board.cols) != (rows, cols):
+        raise ValueError(f"Snapshot of a {rows} x {cols} board, the settings give {board.rows} x {board.cols}")
+    return GameEngine.resume(seed, rng, board, score, shots, board.make_bubble(shooter_style))
+
+
+def save(game, path):
+    """
+    Writes a snapshot of a game to a file. The file is replaced at once, so a crash while saving
+    leaves the previous snapshot in place.
+
+    Args:
+        game (GameEngine): The game.
+        path (str): Path of the file.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(capture(game))
+    os.replace(temporary, path)
+
+
+def load(path):
+    """
+    Reads a game back from a snapshot file, mapped in memory rather than read.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        GameEngine: The saved game.
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            return restore(view)
@@ -1,9 +1,15 @@
 import random
+from functools import lru_cache
+from types import MappingProxyType
+
 import pygame
 
+from config import settings, setting_name
+
 def getProp(prop):
     """
-    Retrieve a predefined property based on its name.
+    Retrieve a setting based on its property name, e.g. 'window-width'.
+    New code reads the attributes of config.settings() directly.
 
     Args:
         prop (str): The name of the property.
@@ -11,25 +17,11 @@ def getProp(prop):
     Returns:
         Various: The value of the requested property.
     """
-    prop = prop.replace('_', '-')
-
-    allProps = {
-        'font': 'Helvetica',
-        'font-size': 20,
-        'window-width': 400,
-        'margin-left': 10,
-        'margin-right': 10,
-        'margin-bottom': 10,
-        'margin-top': 10,
-        'window-height': 600,
-        'FPS': 60,
-        'bubble-number': 12
-    }
-    return allProps[prop]
+    return getattr(settings(), setting_name(prop))
 
 def getGenProp(prop):
     """
-    Retrieve dynamically generated properties based on the current window and bubble settings.
+    Retrieve a setting derived from the others based on its property name, e.g. 'bubble-radius'.
 
     Args:
         prop (str): The name of the property.
@@ -37,23 +29,17 @@ def getGenProp(prop):
     Returns:
         float: The value of the generated property.
     """
-    prop = prop.replace('_', '-')
-    allGenProps = {
-        'bubble-radius': (min(
-            (actual_window_size()[0] / (bubble_window_size()[0] + 1)),
-            (actual_window_size()[1] / (bubble_window_size()[1] + 1))
-        ) / 2)
-    }
-    return allGenProps[prop]
+    return getattr(settings(), setting_name(prop))
 
 def bubble_window_size():
     """
     Get the dimensions of the bubble grid in terms of the number of bubbles.
 
     Returns:
-        tuple: A tuple (width, height) representing the grid dimensions.
+        tuple: A tuple (columns, rows) representing the grid dimensions.
     """
-    return getProp('bubble-number'), getProp('bubble-number')
+    config = settings()
+    return config.board_columns, config.board_rows
 
 def actual_window_size():
     """
@@ -62,8 +48,9 @@ def actual_window_size():
     Returns:
         tuple: A tuple (width, height) representing the usable window dimensions.
     """
-    return (getProp('window-width') - (getProp('margin-left') + getProp('margin-right')),
-            getProp('window-height') - (getProp('margin-bottom') + getProp('margin-top')))
+    config = settings()
+    return (config.window_width - (config.margin_left + config.margin_right),
+            config.window_height - (config.margin_bottom + config.margin_top))
 
 def window_size():
     """
@@ -72,33 +59,36 @@ def window_size():
     Returns:
         tuple: A tuple (width, height) representing the total window dimensions.
     """
-    return getProp('window-width'), getProp('window-height')
+    config = settings()
+    return config.window_width, config.window_height
+
+# Predefined color names and their corresponding hex values
+COLORS = MappingProxyType({
+    "background": "#B8BEE0",
+    "grey": "#738290",
+    "white": "#FFFCF7",
+    "black": "#0A0908",
+    "brown": "#2E282A",
+    "purple": "#8b43cc",
+    "yellow": "#e8d915",
+    "blue": "#A1B5D8",
+    "orange": "#F38D68",
+    "cyan": "#43b4a4",
+    "lightgreen": "#E4F0D0",
+    "green": "#C2D8B9",
+    "red": "#E5625E",
+    "pink": "#FFB8D1"
+})
 
 def colors():
     """
     Retrieve a dictionary of predefined color names and their corresponding hex values.
+    The same read-only dictionary is returned on every call.
 
     Returns:
         dict: A dictionary mapping color names to hex values.
     """
-    colorsMap = {
-        "background": "#B8BEE0",
-        "grey": "#738290",
-        "white": "#FFFCF7",
-        "black": "#0A0908",
-        "brown": "#2E282A",
-        "purple": "#8b43cc",
-        "yellow": "#e8d915",
-        "blue": "#A1B5D8",
-        "orange": "#F38D68",
-        "cyan": "#43b4a4",
-        "lightgreen": "#E4F0D0",
-        "green": "#C2D8B9",
-        "red": "#E5625E",
-        "pink": "#FFB8D1"
-    }
-
-    return colorsMap
+    return COLORS
 
 def darker_colors(fromColors):
     """
@@ -124,18 +114,20 @@ def ligther_colors(fromColors):
     """
     return [fromColors[col] for col in fromColors.keys() if not is_color_dark(fromColors[col])]
 
-def randomItemFrom(someList):
+def randomItemFrom(someList, rng=random):
     """
     Select a random item from a list or iterable.
 
     Args:
         someList (iterable): The list or iterable to select from.
+        rng (random.Random): The random generator to draw from, the global one by default.
 
     Returns:
         Various: A random item from the list.
     """
-    return random.choice(list(someList))
+    return rng.choice(list(someList))
 
+@lru_cache(maxsize=None)
 def hex_to_rgb(hex):
     """
     Convert a hex color string to an RGB tuple.
@@ -181,17 +173,51 @@ def gradientRect(window, top_colour, bottom_colour, target_rect):
     colour_rect = pygame.transform.smoothscale(colour_rect, (target_rect.width, target_rect.height))
     window.blit(colour_rect, target_rect)
 
+# The last rendered background, keyed by (top color, bottom color, size)
+_background_cache = {}
+
+def gradient_surface(top_colour, bottom_colour, size):
+    """
+    Get a surface filled with a vertical gradient, rendering it only when the colors or the size change.
+
+    Args:
+        top_colour (tuple): RGB color of the gradient's top.
+        bottom_colour (tuple): RGB color of the gradient's bottom.
+        size (tuple): Width and height of the surface.
+
+    Returns:
+        pygame.Surface: The gradient surface.
+    """
+    key = (top_colour, bottom_colour, size)
+    surface = _background_cache.get(key)
+    if surface is None:
+        invalidate_background()  # Backgrounds of other sizes or palettes are not needed anymore
+        surface = pygame.Surface(size)
+        gradientRect(surface, top_colour, bottom_colour, surface.get_rect())
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        _background_cache[key] = surface
+    return surface
+
+def invalidate_background():
+    """
+    Drop the cached background, so that it is rendered again on the next draw.
+    """
+    _background_cache.clear()
+
 def draw_background(window):
     """
     Draw a gradient background on the game window.
+    The gradient is rendered once per palette and window size, then only blitted.
 
     Args:
         window (pygame.Surface): The Pygame window.
     """
     background_color = hex_to_rgb(colors()['background'])
     blue_color = hex_to_rgb(colors()['white'])
-    gradientRect(window, background_color, blue_color, pygame.Rect(0, 0, window_size()[0], window_size()[1]))
+    window.blit(gradient_surface(background_color, blue_color, window.get_size()), (0, 0))
 
+@lru_cache(maxsize=None)
 def is_color_dark(hex_color: str) -> bool:
     """
     Determine if a given color is dark based on its luminance.
@@ -218,30 +244,98 @@ def is_color_dark(hex_color: str) -> bool:
     luminance = 0.2126 * r + 0.7152 * g + 0.0722 * b
     return luminance < 0.5
 
-def levelK_colors(lvl):
+def levelK_colors(lvl, rng=random):
     """
     Select colors for a given level.
 
     Args:
         lvl (int): The level index.
+        rng (random.Random): The random generator to draw from, the global one by default.
 
     Returns:
         dict: A dictionary of selected color names and their hex values.
     """
-    allCols = colors()
-    allCols.pop('background')
-    choose_sum = random.choices(list(allCols.keys()), k=min(4 + lvl, len(list(allCols.keys()))))
-    print(f"Chose some colors> {choose_sum}")
-    return {col: allCols[col] for col in choose_sum}
+    choose_sum = rng.choices(BUBBLE_COLOR_NAMES, k=min(4 + lvl, len(BUBBLE_COLOR_NAMES)))
+    # Bubbles need both a light fill and a dark outline, so make sure both kinds were chosen
+    for need_dark, names in ((True, DARK_COLOR_NAMES), (False, LIGHT_COLOR_NAMES)):
+        if not any(is_color_dark(COLORS[col]) == need_dark for col in choose_sum):
+            choose_sum[-1 if need_dark else 0] = randomItemFrom(names, rng)
+    return {col: COLORS[col] for col in choose_sum}
 
-def colorForLevel(lvlIndex):
+def colorForLevel(lvlIndex, rng=random):
     """
     Get colors for a specific level.
 
     Args:
         lvlIndex (int): The level index.
+        rng (random.Random): The random generator to draw from, the global one by default.
 
     Returns:
         dict: A dictionary of colors for the level.
     """
-    return levelK_colors(lvlIndex)
+    return levelK_colors(lvlIndex, rng)
+
+# Names of the colors bubbles can take, split by luminance once
+BUBBLE_COLOR_NAMES = [col for col in COLORS.keys() if col != 'background']
+DARK_COLOR_NAMES = [col for col in BUBBLE_COLOR_NAMES if is_color_dark(COLORS[col])]
+LIGHT_COLOR_NAMES = [col for col in BUBBLE_COLOR_NAMES if not is_color_dark(COLORS[col])]
+# Index of every bubble color name, as saved in replay logs, snapshots and level packs
+COLOR_INDEX = {name: n for n, name in enumerate(BUBBLE_COLOR_NAMES)}
+
+def to_rgb(color):
+    """
+    Convert a color given as a hex string or an RGB tuple to an RGB tuple.
+    """
+    return hex_to_rgb(color) if isinstance(color, str) else tuple(color)
+
+class Palette:
+    """
+    The bubble styles of a color set, computed once per color set.
+    Attributes:
+        - light: RGB colors of the set used to fill bubbles.
+        - dark: RGB colors of the set used to outline bubbles.
+        - styles: (fill, outline) RGB pairs; index 0 is the clear style, followed by every
+          light fill combined with every dark outline.
+    """
+    def __init__(self, colorset):
+        """
+        Splits a color set into light and dark colors and builds its styles.
+
+        Args:
+            colorset (dict): A dictionary of color names and their hex values.
+        """
+        background = hex_to_rgb(COLORS['background'])
+        self.light = [hex_to_rgb(col) for col in ligther_colors(colorset)]
+        self.dark = [hex_to_rgb(col) for col in darker_colors(colorset)]
+        self.styles = [(background, background)] + [(fill, out) for fill in self.light for out in self.dark]
+
+    def random_style(self, rng=random):
+        """
+        Picks a random bubble style, every fill and outline being equally likely.
+
+        Args:
+            rng (random.Random): The random generator to draw from, the global one by default.
+
+        Returns:
+            int: The index of the chosen style.
+        """
+        return rng.randrange(1, len(self.styles))
+
+# Palettes already computed, keyed by the items of their color set
+_palettes = {}
+
+def palette_for(colorset):
+    """
+    Get the palette of a color set, computing it the first time it is asked for.
+
+    Args:
+        colorset (dict): A dictionary of color names and their hex values.
+
+    Returns:
+        Palette: The palette of the color set.
+    """
+    key = tuple(colorset.items())
+    palette = _palettes.get(key)
+    if palette is None:
+        palette = _palettes[key] = Palette(colorset)
+    return palette
@@ -0,0 +1,40 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+import config
+import draw
+import replay
+from effects import initialize_window
+
+SHOT_DELAY = 600  # Milliseconds the game stays idle before the shot
+QUIT_DELAY = 1500
+
+
+def test_shot_after_idle_wait_is_recorded_at_its_time(tmp_path):
+    """
+    A shot fired after the loop slept idle is recorded at the frame it would have had at the frame rate,
+    and the log replays as recorded.
+    """
+    saved = config.settings()
+    try:
+        current = config.override(idle_timeout=50)
+        window, clock = initialize_window(current.window_width, current.window_height, "Bubble Buster")
+        pygame.time.set_timer(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(200, 100)), SHOT_DELAY,
+                              loops=1)
+        pygame.time.set_timer(pygame.QUIT, QUIT_DELAY, loops=1)
+        frames = draw.run(window, clock, draw.init_game(7), record=replay.recorder_in(str(tmp_path)))
+
+        (log,) = tmp_path.iterdir()
+        recorded = replay.load(str(log))
+        assert len(recorded.shots) == 1
+        shot_frame = recorded.shots[0][0]
+        # Without the skipped frames, the shot would be recorded within the first few frames
+        assert SHOT_DELAY * current.fps / 1000 * 0.8 <= shot_frame <= QUIT_DELAY * current.fps / 1000
+        assert shot_frame < frames
+        assert replay.check(recorded) == []
+    finally:
+        pygame.quit()
+        config.restore(saved)
@@ -0,0 +1,245 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import random
+import statistics
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from bot import Bot
+from engine import GameEngine
+
+
+class RandomPolicy:
+    """
+    Shoots at random angles, drawn from a generator seeded with the game.
+    """
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def choose(self, game):
+        return self.rng.uniform(5, 175)
+
+
+class StraightPolicy:
+    """
+    Always shoots straight up.
+    """
+    def __init__(self, seed=None):
+        pass
+
+    def choose(self, game):
+        return 90
+
+
+def bot_policy(seed=None):
+    """
+    The autoplay bot, rating its shots in the process playing the game.
+    """
+    return Bot(workers=0)
+
+
+# Policies known by name; others are given as 'module:factory'
+POLICIES = {
+    'random': RandomPolicy,
+    'straight': StraightPolicy,
+    'bot': bot_policy,
+}
+
+
+def make_policy(name, seed=None):
+    """
+    Creates the shot policy of a game.
+    A policy is any object whose choose(game) method returns the angle of the next shot.
+
+    Args:
+        name (str): A name of POLICIES, or 'module:factory' for a factory taking the seed of the game.
+        seed (int): Seed of the game.
+
+    Returns:
+        object: The policy.
+    """
+    if name in POLICIES:
+        return POLICIES[name](seed)
+    module, _, factory = name.partition(':')
+    if not factory:
+        raise ValueError(f"Unknown policy {name}, expected one of {', '.join(POLICIES)} or module:factory")
+    return getattr(importlib.import_module(module), factory)(seed)
+
+
+def play(seed, policy_name, max_shots):
+    """
+    Plays a headless game with a policy.
+
+    Args:
+        seed (int): Seed of the game.
+        policy_name (str): The policy, as given to make_policy.
+        max_shots (int): Number of shots after which the game is stopped.
+
+    Returns:
+        dict: How the game went: seed, level reached, score, shots fired on every level and the cause of the end.
+    """
+    game = GameEngine(seed)
+    policy = make_policy(policy_name, seed)
+    shots_per_level = [0]
+    while game.game_over is None and sum(shots_per_level) < max_shots:
+        outcome = game.shoot(policy.choose(game))
+        shots_per_level[-1] += 1
+        if outcome.level_complete:
+            shots_per_level.append(0)
+    return {
+        'seed': seed,
+        'level': game.level,
+        'score': game.score.score,
+        'shots': shots_per_level,
+        'cause': game.game_over or 'max-shots',
+    }
+
+
+def _init_worker(current):
+    """
+    Applies the settings of the tournament in a worker process, as they are in the process running it.
+    """
+    config.restore(current)
+
+
+class Stats:
+    """
+    Statistics of a tournament, updated as the results of the games come in.
+    Attributes:
+        - games: Number of games played.
+        - levels: Number of games per level reached.
+        - scores: Final score of every game.
+        - level_shots: For every level, the number of shots it took to clear it in every game that cleared it.
+        - causes: Number of games per cause of the end of the game.
+    """
+    def __init__(self):
+        self.games = 0
+        self.levels = Counter()
+        self.scores = []
+        self.level_shots = {}
+        self.causes = Counter()
+
+    def add(self, result):
+        """
+        Adds the result of a game, as returned by play.
+        """
+        self.games += 1
+        self.levels[result['level']] += 1
+        self.scores.append(result['score'])
+        self.causes[result['cause']] += 1
+        # The last level was not cleared
+        for level, shots in enumerate(result['shots'][:-1], start=1):
+            self.level_shots.setdefault(level, []).append(shots)
+
+    def summary(self):
+        """
+        Returns:
+            dict: The aggregated statistics.
+        """
+        scores = sorted(self.scores)
+        deciles = statistics.quantiles(scores, n=10, method='inclusive') if len(scores) > 1 else scores
+        return {
+            'games': self.games,
+            'levels': dict(sorted(self.levels.items())),
+            'score': {
+                'mean': statistics.fmean(scores) if scores else 0,
+                'min': scores[0] if scores else 0,
+                'median': statistics.median(scores) if scores else 0,
+                'max': scores[-1] if scores else 0,
+                'deciles': deciles,
+            },
+            'shots_per_level': {level: statistics.fmean(shots) for level, shots in sorted(self.level_shots.items())},
+            'causes': dict(self.causes.most_common()),
+        }
+
+    def report(self):
+        """
+        Returns:
+            str: The statistics as readable text.
+        """
+        summary = self.summary()
+        score = summary['score']
+        lines = [
+            f"games: {summary['games']}",
+            "levels reached: " + ", ".join(f"{level}: {count}" for level, count in summary['levels'].items()),
+            f"score: mean {score['mean']:.1f}, min {score['min']}, median {score['median']}, max {score['max']}",
+            "score deciles: " + ", ".join(f"{value:g}" for value in score['deciles']),
+            "shots to clear a level: " + (", ".join(
+                f"{level}: {shots:.1f}" for level, shots in summary['shots_per_level'].items()) or "no level cleared"),
+            "end of game: " + ", ".join(f"{cause}: {count}" for cause, count in summary['causes'].items()),
+        ]
+        return "\n".join(lines)
+
+
+def run(games, policy_name='bot', seed=0, workers=None, max_shots=1000, overrides=None):
+    """
+    Plays a tournament of seeded games over a pool of processes.
+
+    Args:
+        games (int): Number of games; their seeds count up from seed.
+        policy_name (str): The policy, as given to make_policy.
+        seed (int): Seed of the first game.
+        workers (int): Number of worker processes, one per core if not given, 0 to play in this process.
+        max_shots (int): Number of shots after which a game is stopped.
+        overrides (dict): Settings overriding the current ones while the games are played, e.g. {'push_interval': 6};
+            the settings of the caller are left as they were.
+
+    Returns:
+        Stats: The statistics of the games.
+    """
+    make_policy(policy_name)  # Fail before starting the workers if the policy is unknown
+    stats = Stats()
+    seeds = range(seed, seed + games)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    saved = config.settings()
+    try:
+        # The overrides only apply while the games are played
+        current = config.override(**(overrides or {}))
+        if workers == 0:
+            for game_seed in seeds:
+                stats.add(play(game_seed, policy_name, max_shots))
+            return stats
+
+        chunksize = max(1, math.ceil(games / (workers * 8)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(current,)) as executor:
+            for result in executor.map(play, seeds, [policy_name] * games, [max_shots] * games, chunksize=chunksize):
+                stats.add(result)
+    finally:
+        config.restore(saved)
+    return stats
+
+
+def main(argv=None):
+    """
+    Runs a tournament and prints its statistics.
+    """
+    parser = argparse.ArgumentParser(description="Play seeded headless Bubble Buster games and aggregate statistics.")
+    parser.add_argument('--games', type=int, default=1000, help="number of games to play")
+    parser.add_argument('--policy', default='bot',
+                        help=f"shot policy: {', '.join(POLICIES)} or module:factory (default: bot)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, the next games count up")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, one per core by default")
+    parser.add_argument('--max-shots', type=int, default=1000, help="shots after which a game is stopped")
+    parser.add_argument('--push-interval', type=int, default=None, help="shots between two row pushes")
+    parser.add_argument('--json', metavar='FILE', help="also write the statistics to a JSON file")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    if args.push_interval is not None:
+        overrides['push_interval'] = args.push_interval
+    try:
+        stats = run(args.games, args.policy, args.seed, args.workers, args.max_shots, overrides)
+    except ValueError as error:
+        parser.error(str(error))
+    print(stats.report())
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(stats.summary(), file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
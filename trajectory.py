@@ -0,0 +1,425 @@
+import math
+
+from config import settings
+
+
+class ShotPath:
+    """
+    The resolved flight of a shot across the gameboard.
+    Attributes:
+        - points: Polyline of (x, y) points from the shooter to where the bubble stops.
+        - hit: (row, column) of the bubble that stopped the shot, or None if it reached the top.
+        - cell: (row, column) of the cell where the bubble lands, or None if it cannot land.
+        - game_over: True if the shot stopped against the last row of the board.
+    """
+    def __init__(self, points, hit, cell, game_over):
+        self.points = points
+        self.hit = hit
+        self.cell = cell
+        self.game_over = game_over
+
+    def length(self):
+        """
+        Returns:
+            float: The total length of the flight in pixels.
+        """
+        return sum(math.dist(a, b) for a, b in zip(self.points, self.points[1:]))
+
+    def position_at(self, distance):
+        """
+        Returns the position of the bubble after travelling a given distance along the path.
+
+        Args:
+            distance (float): Distance travelled from the shooter, in pixels.
+
+        Returns:
+            tuple: The (x, y) position, clamped to the end of the path.
+        """
+        for (x1, y1), (x2, y2) in zip(self.points, self.points[1:]):
+            segment = math.dist((x1, y1), (x2, y2))
+            if distance <= segment and segment > 0:
+                ratio = distance / segment
+                return x1 + (x2 - x1) * ratio, y1 + (y2 - y1) * ratio
+            distance -= segment
+        return self.points[-1]
+
+
+def hit_distance(board):
+    """
+    Returns the distance between two bubble centers at which a flying bubble collides.
+    """
+    from game_elements import BoardCell  # game_elements imports this module
+    return 2 * board.radius + 2 * BoardCell.outline_width
+
+
+def segment_candidates(board, x, y, dx, dy, length, reach):
+    """
+    Lists the cells whose collision circle a straight, upward moving segment of the flight can touch.
+    Only the cells within reach of the segment are visited, row by row,
+    in the order in which the segment reaches the rows.
+
+    Args:
+        board (Gameboard): The gameboard.
+        x (float): X-coordinate of the start of the segment.
+        y (float): Y-coordinate of the start of the segment.
+        dx (float): Horizontal component of the unit direction.
+        dy (float): Vertical component of the unit direction (negative).
+        length (float): Length of the segment.
+        reach (float): Collision distance, as given by hit_distance.
+
+    Yields:
+        tuple: (t_enter, row, first column, last column) for every row the segment reaches,
+        t_enter being the distance travelled when the segment gets within reach of the row.
+    """
+    spacing = 2 * board.radius
+    top_y = board.ycoords[board.index(0, 0)]
+
+    # Rows are visited from the lowest one the segment can touch upwards
+    last_row = min(board.rows - 1, math.floor((y + reach - top_y) / spacing))
+    for i in range(last_row, -1, -1):
+        row_y = top_y + i * spacing
+        t_enter = max(0.0, (y - (row_y + reach)) / -dy)
+        if t_enter > length:
+            return
+        t_leave = min(length, (y - (row_y - reach)) / -dy)
+        if t_leave < 0:
+            continue
+
+        # Columns whose circle lies within reach of the part of the segment crossing this row
+        xa, xb = sorted((x + t_enter * dx, x + t_leave * dx))
+        row_x = board.xcoords[board.index(i, 0)]
+        j_min = max(0, math.ceil((xa - reach - row_x) / spacing))
+        j_max = min(board.cols - 1, math.floor((xb + reach - row_x) / spacing))
+        yield t_enter, i, j_min, j_max
+
+
+def circle_entry(board, x, y, dx, dy, k, reach):
+    """
+    Solves |P + t * d - C| = reach for the smallest t, C being the center of the cell k
+    and reach the collision distance given by hit_distance.
+
+    Returns:
+        float or None: The distance travelled when the flying bubble touches the cell, or None if it never does.
+    """
+    cx, cy = board.xcoords[k] - x, board.ycoords[k] - y
+    b = cx * dx + cy * dy
+    c = cx * cx + cy * cy - reach * reach
+    disc = b * b - c
+    if disc < 0 or (c > 0 and b < 0):
+        return None
+    return max(0.0, b - math.sqrt(disc))
+
+
+def first_hit_in_segment(board, x, y, dx, dy, length, reach):
+    """
+    Finds the first bubble hit by a straight, upward moving segment of the flight.
+
+    Args:
+        board (Gameboard): The gameboard.
+        x (float): X-coordinate of the start of the segment.
+        y (float): Y-coordinate of the start of the segment.
+        dx (float): Horizontal component of the unit direction.
+        dy (float): Vertical component of the unit direction (negative).
+        length (float): Length of the segment.
+        reach (float): Collision distance, as given by hit_distance.
+
+    Returns:
+        tuple or None: (t, row, column) of the first hit, t being the distance travelled, or None.
+    """
+    grid = board.grid
+    best = None
+    for t_enter, i, j_min, j_max in segment_candidates(board, x, y, dx, dy, length, reach):
+        if best is not None and t_enter > best[0]:
+            break
+        row_start = board.index(i, 0)
+        for j in range(j_min, j_max + 1):
+            if not grid[row_start + j]:
+                continue
+            t = circle_entry(board, x, y, dx, dy, row_start + j, reach)
+            if t is not None and t <= length and (best is None or t < best[0]):
+                best = (t, i, j)
+    return best
+
+
+def segments(x, y, dx, dy):
+    """
+    Splits a flight into straight segments between wall bounces, up to the top of the window.
+
+    Args:
+        x (float): X-coordinate of the shooter.
+        y (float): Y-coordinate of the shooter.
+        dx (float): Horizontal component of the unit direction.
+        dy (float): Vertical component of the unit direction (negative).
+
+    Yields:
+        tuple: (x, y, dx, dy, length, reaches_top) for every segment.
+    """
+    window_width = settings().window_width
+    while True:
+        # Distance to the next wall and to the top of the window
+        if dx > 0:
+            t_wall = (window_width - x) / dx
+        elif dx < 0:
+            t_wall = -x / dx
+        else:
+            t_wall = float('inf')
+        t_top = y / -dy
+        yield x, y, dx, dy, min(t_wall, t_top), t_top <= t_wall
+        if t_top <= t_wall:
+            return
+
+        # Bounce off the wall
+        x, y = (0 if dx < 0 else window_width), y + t_wall * dy
+        dx = -dx
+
+
+def trace_cells(board, x, y, dx, dy):
+    """
+    Lists every cell the flight would touch on an empty board, in the order in which it touches them.
+    The first occupied cell of the list is the bubble that stops the shot.
+
+    Args:
+        board (Gameboard): The gameboard, only its layout is used.
+        x (float): X-coordinate of the shooter.
+        y (float): Y-coordinate of the shooter.
+        dx (float): Horizontal component of the shooting direction.
+        dy (float): Vertical component of the shooting direction.
+
+    Returns:
+        tuple: A list of (row, column, x, y) entries, (x, y) being the position of the flying bubble
+        when it touches the cell, and the x-coordinate where the flight reaches the top,
+        or None if the shot never rises.
+    """
+    norm = math.hypot(dx, dy)
+    dx, dy = dx / norm, dy / norm
+    if dy >= -1e-9:
+        return [], None
+
+    reach = hit_distance(board)
+    entries = []
+    for sx, sy, sdx, sdy, length, reaches_top in segments(x, y, dx, dy):
+        touched = []
+        for t_enter, i, j_min, j_max in segment_candidates(board, sx, sy, sdx, sdy, length, reach):
+            for j in range(j_min, j_max + 1):
+                t = circle_entry(board, sx, sy, sdx, sdy, board.index(i, j), reach)
+                if t is not None and t <= length:
+                    touched.append((t, i, j))
+        touched.sort()
+        seen = {(i, j) for i, j, _, _ in entries}
+        entries += [(i, j, sx + t * sdx, sy + t * sdy) for t, i, j in touched if (i, j) not in seen]
+        if reaches_top:
+            return entries, sx + length * sdx
+
+
+def landing_cell(board, i, j, x, y):
+    """
+    Chooses the free cell where a bubble stopped by the bubble (i, j) settles.
+    It is the free neighbor of (i, j) closest to the position of the flying bubble.
+
+    Args:
+        board (Gameboard): The gameboard.
+        i (int): Row index of the bubble that was hit.
+        j (int): Column index of the bubble that was hit.
+        x (float): X-coordinate of the flying bubble when it stopped.
+        y (float): Y-coordinate of the flying bubble when it stopped.
+
+    Returns:
+        tuple or None: (row, column) of the landing cell, or None if no neighbor is free.
+    """
+    closest_cell = None
+    min_distance = float('inf')
+    for ni, nj in board.get_neighbors(i, j):
+        k = board.index(ni, nj)
+        if board.grid[k]:
+            continue
+        distance = (x - board.xcoords[k]) ** 2 + (y - board.ycoords[k]) ** 2
+        if distance < min_distance:
+            closest_cell = (ni, nj)
+            min_distance = distance
+    return closest_cell
+
+
+def resolve_shot(board, x, y, dx, dy):
+    """
+    Resolves a whole shot in closed form: the flight is split into straight segments
+    between wall bounces and each segment is intersected with the bubbles it passes by.
+
+    Args:
+        board (Gameboard): The gameboard.
+        x (float): X-coordinate of the shooter.
+        y (float): Y-coordinate of the shooter.
+        dx (float): Horizontal component of the shooting direction.
+        dy (float): Vertical component of the shooting direction.
+
+    Returns:
+        ShotPath: The resolved flight of the shot.
+    """
+    norm = math.hypot(dx, dy)
+    dx, dy = dx / norm, dy / norm
+    points = [(x, y)]
+
+    if dy >= -1e-9:
+        # A shot that never rises only bounces between the walls and never lands
+        return ShotPath(points, None, None, False)
+
+    reach = hit_distance(board)
+    for x, y, dx, dy, length, reaches_top in segments(x, y, dx, dy):
+        hit = first_hit_in_segment(board, x, y, dx, dy, length, reach)
+        if hit is not None:
+            t, i, j = hit
+            end = (x + t * dx, y + t * dy)
+            points.append(end)
+            if i == board.rows - 1:
+                return ShotPath(points, (i, j), None, True)
+            return ShotPath(points, (i, j), landing_cell(board, i, j, end[0], end[1]), False)
+
+        x, y = x + length * dx, y + length * dy
+        points.append((x, max(0, y)))
+        if reaches_top:
+            return ShotPath(points, None, board.find_closest_free_top(x), False)
+
+
+# Angle resolution of the landing tables, in degrees
+LANDING_STEP = 0.25
+
+# Shooter directions traced over an empty board, keyed by the layout of the board and the shooter position
+_sweeps = {}
+
+
+class Sweep:
+    """
+    The shooter directions of a board layout traced over an empty board, each one the first time it is needed.
+    Attributes:
+        - step: Angle resolution in degrees.
+        - traces: For every direction, (flat cells, touch positions, top x) as given by trace_cells,
+          or None while the direction was not traced.
+        - touches: For every flat cell index, the (direction, position in the trace) pairs of the traced
+          directions touching it.
+    """
+    def __init__(self, board, x, y, step):
+        """
+        Args:
+            board (Gameboard): A board with the layout, only its layout is used.
+            x (float): X-coordinate of the shooter.
+            y (float): Y-coordinate of the shooter.
+            step (float): Angle resolution in degrees.
+        """
+        self.board, self.x, self.y = board, x, y
+        self.step = step
+        self.traces = [None] * (round(180 / step) + 1)
+        self.touches = [[] for _ in range(len(board.grid))]
+
+    def trace(self, n):
+        """
+        Returns the trace of the direction n, tracing it if needed.
+        """
+        if self.traces[n] is None:
+            board, angle = self.board, math.radians(n * self.step)
+            entries, top_x = trace_cells(board, self.x, self.y, math.cos(angle), -math.sin(angle))
+            cells = [board.index(i, j) for i, j, _, _ in entries]
+            for position, k in enumerate(cells):
+                self.touches[k].append((n, position))
+            self.traces[n] = (cells, [(ex, ey) for _, _, ex, ey in entries], top_x)
+        return self.traces[n]
+
+
+def sweep(board, x, y, step=LANDING_STEP):
+    """
+    Returns the Sweep of a board layout and shooter position, shared by every board with that layout.
+
+    Args:
+        board (Gameboard): The gameboard, only its layout is used.
+        x (float): X-coordinate of the shooter.
+        y (float): Y-coordinate of the shooter.
+        step (float): Angle resolution in degrees.
+    """
+    key = (board.rows, board.cols, board.radius, board.xcoords[0], board.ycoords[0],
+           x, y, settings().window_width, step)
+    if key not in _sweeps:
+        _sweeps[key] = Sweep(board, x, y, step)
+    return _sweeps[key]
+
+
+class LandingTable:
+    """
+    Predicts the landing cell of a shot for every quantized shooter angle of a board.
+    For each direction it keeps the position of the first occupied cell of the direction's trace,
+    which is the bubble stopping the shot, and updates it only for the directions touching a changed cell.
+    Directions are traced and scanned the first time they are looked up, so large boards do not
+    pay for the whole sweep at once.
+    Attributes:
+        - board: The gameboard the predictions are for.
+        - sweep: The Sweep of the board layout.
+        - first: For every direction, the position in its trace of the first occupied cell,
+          None while the direction was not looked up.
+    """
+    def __init__(self, board, x, y, step=LANDING_STEP):
+        """
+        Args:
+            board (Gameboard): The gameboard.
+            x (float): X-coordinate of the shooter.
+            y (float): Y-coordinate of the shooter.
+            step (float): Angle resolution in degrees.
+        """
+        self.board = board
+        self.sweep = sweep(board, x, y, step)
+        self.first = [None] * len(self.sweep.traces)
+
+    def first_occupied(self, n, start):
+        """
+        Returns the position of the first occupied cell of the direction n from a position of its trace on.
+        """
+        cells, grid = self.sweep.trace(n)[0], self.board.grid
+        while start < len(cells) and not grid[cells[start]]:
+            start += 1
+        return start
+
+    def refresh(self):
+        """
+        Scans every direction looked up so far again, e.g. after the rows of the board were pushed.
+        """
+        for n, position in enumerate(self.first):
+            if position is not None:
+                self.first[n] = self.first_occupied(n, 0)
+
+    def update(self, cells):
+        """
+        Updates the directions touching cells that were filled or cleared.
+
+        Args:
+            cells (iterable): (row, column) of the changed cells.
+        """
+        grid, first = self.board.grid, self.first
+        for i, j in cells:
+            k = self.board.index(i, j)
+            for n, position in self.sweep.touches[k]:
+                if first[n] is None:
+                    continue
+                if grid[k]:
+                    first[n] = min(first[n], position)
+                elif first[n] == position:
+                    first[n] = self.first_occupied(n, position + 1)
+
+    def landing(self, angle):
+        """
+        Looks up where a shot at the given angle lands.
+
+        Args:
+            angle (float): Shooter angle in degrees (0 is right, 90 is straight up).
+
+        Returns:
+            tuple or None: (row, column) of the landing cell, or None if the shot cannot land.
+        """
+        n = min(len(self.first) - 1, max(0, round(angle / self.sweep.step)))
+        cells, positions, top_x = self.sweep.trace(n)
+        if self.first[n] is None:
+            self.first[n] = self.first_occupied(n, 0)
+        position = self.first[n]
+        if position < len(cells):
+            i, j = divmod(cells[position], self.board.cols)
+            if i == self.board.rows - 1:
+                return None
+            return landing_cell(self.board, i, j, *positions[position])
+        if top_x is None:
+            return None
+        return self.board.find_closest_free_top(top_x)